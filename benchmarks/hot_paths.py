@@ -0,0 +1,229 @@
+"""
+Micro-benchmarks of RepositoryCloner's pure-Python hot paths (per MR comment, per push, per Jenkins job).
+Run from repo root:
+    python -m benchmarks.hot_paths                   # compare with baseline, exit code 1 on regression
+    python -m benchmarks.hot_paths --save-baseline   # write current results as baseline
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+from cloner_transforms import (format_comment_text, get_comment_to_codeline_creation_request_data,
+                               get_failed_branches, replace_markdown_links, rewrite_jenkins_job_config)
+
+BASELINE_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 1.5
+REPEATS = 10
+MIN_TIMING_SECONDS = 0.1
+GITLAB_PROJECT_WEB_URL = 'https://gitlab.example.com/some-group/some-project'
+BITBUCKET_REPO_URL = 'ssh://git@bitbucket.example.com:7999/prj/some.prefix.some-project.git'
+RANDOM_SEED = 42
+# reference workload timed with benchmarks, ratios are normalized by it so overall machine speed doesn't matter
+CALIBRATION_NAME = 'calibration'
+
+
+def make_markdown_texts(count: int = 100) -> list:
+    """
+    MR descriptions and comments: plain text, code blocks, links of all supported upload forms
+    """
+    random_generator = random.Random(RANDOM_SEED)
+    words = ['fix', 'bug', 'in', 'parser', 'see', 'screenshot', 'the', 'cache', 'is', 'rebuilt', 'on', 'start']
+    upload_links = ['![img](/uploads/{0}/screen.png)', '[log](uploads/{0}/build.log)',
+                    '![img] (/uploads/{0}/diff.png)', '[file] (uploads/{0}/dump.txt)', '[docs](https://docs.io/a)']
+    texts = []
+    for _ in range(count):
+        parts = [' '.join(random_generator.choices(words, k=random_generator.randint(5, 60)))]
+        if random_generator.random() < 0.4:
+            parts.extend(random_generator.choice(upload_links).format(f'{random_generator.getrandbits(64):016x}')
+                         for _ in range(random_generator.randint(1, 4)))
+        if random_generator.random() < 0.3:
+            parts.append('```python\nfor item in items:\n    process(item)\n```')
+        texts.append('\n'.join(parts))
+    return texts
+
+
+def make_comment_positions(count: int = 100) -> list:
+    """
+    Positions of MR comments to code: added, removed, context lines and renamed files
+    """
+    random_generator = random.Random(RANDOM_SEED)
+    positions = []
+    for index in range(count):
+        new_line, old_line = random_generator.choice([(10, None), (None, 12), (15, 15)])
+        new_path = f'src/module_{index % 17}/file_{index}.py'
+        old_path = new_path if random_generator.random() < 0.9 else f'src/old_{index}.py'
+        positions.append({'new_line': new_line, 'old_line': old_line, 'new_path': new_path, 'old_path': old_path})
+    return positions
+
+
+def make_comments(count: int = 100) -> list:
+    """
+    MR comments as (author, Gitlab timestamp, body)
+    """
+    random_generator = random.Random(RANDOM_SEED)
+    return [(f'User {index % 13}',
+             f'2021-{random_generator.randint(1, 12):02d}-{random_generator.randint(1, 28):02d}T'
+             f'{random_generator.randint(0, 23):02d}:{random_generator.randint(0, 59):02d}:'
+             f'{random_generator.randint(0, 59):02d}.{random_generator.randint(0, 999):03d}Z',
+             body) for index, body in enumerate(make_markdown_texts(count))]
+
+
+def make_push_output(branches_count: int = 20000, rejected_share: float = 0.01) -> str:
+    """
+    "git push --all" output of repo with many branches, some of them rejected
+    """
+    random_generator = random.Random(RANDOM_SEED)
+    lines = ['To ssh://git@bitbucket.example.com:7999/prj/repo.git']
+    for index in range(branches_count):
+        branch = f'feature/TASK-{index}-some-branch-name'
+        if random_generator.random() < rejected_share:
+            lines.append(f' ! [rejected]        {branch} -> {branch} (fetch first)')
+        else:
+            lines.append(f' * [new branch]      {branch} -> {branch}')
+    lines.append("error: failed to push some refs to 'ssh://git@bitbucket.example.com:7999/prj/repo.git'")
+    return '\n'.join(lines)
+
+
+def make_jenkins_job_config(parameters_count: int = 30) -> str:
+    """
+    Jenkins pipeline job XML config with string parameters, one of them is repo url
+    """
+    parameters = []
+    for index in range(parameters_count):
+        name = 'PROJECT_GIT' if index == parameters_count // 2 else f'PARAM_{index}'
+        parameters.append(f'''        <hudson.model.StringParameterDefinition>
+          <name>{name}</name>
+          <description>parameter {index}</description>
+          <defaultValue>git@gitlab.example.com:some-group/some-project.git</defaultValue>
+          <trim>false</trim>
+        </hudson.model.StringParameterDefinition>''')
+    parameters_xml = '\n'.join(parameters)
+    return f'''<?xml version='1.1' encoding='UTF-8'?>
+<flow-definition plugin="workflow-job@2.40">
+  <description>Build of some-project</description>
+  <keepDependencies>false</keepDependencies>
+  <properties>
+    <hudson.model.ParametersDefinitionProperty>
+      <parameterDefinitions>
+{parameters_xml}
+      </parameterDefinitions>
+    </hudson.model.ParametersDefinitionProperty>
+  </properties>
+  <definition class="org.jenkinsci.plugins.workflow.cps.CpsScmFlowDefinition" plugin="workflow-cps@2.90">
+    <scriptPath>Jenkinsfile</scriptPath>
+    <lightweight>true</lightweight>
+  </definition>
+  <triggers/>
+  <disabled>false</disabled>
+</flow-definition>'''
+
+
+def get_benchmarks() -> dict:
+    """
+    Returns benchmarks {name: callable making one operation}
+    """
+    texts = make_markdown_texts()
+    positions = make_comment_positions()
+    comments = make_comments()
+    push_output = make_push_output()
+    jenkins_job_config = make_jenkins_job_config()
+    calibration_data = [str(index) for index in range(10000)]
+    return {
+        CALIBRATION_NAME: lambda: sorted(calibration_data, key=lambda item: item[::-1]),
+        'replace_markdown_links':
+            lambda: [replace_markdown_links(text, GITLAB_PROJECT_WEB_URL) for text in texts],
+        'comment_to_codeline_request_data':
+            lambda: [get_comment_to_codeline_creation_request_data(position, 'text') for position in positions],
+        'format_comment_text':
+            lambda: [format_comment_text(author, created_at, body) for author, created_at, body in comments],
+        'failed_branches_from_push_output': lambda: get_failed_branches(push_output),
+        'rewrite_jenkins_job_config': lambda: rewrite_jenkins_job_config(jenkins_job_config, BITBUCKET_REPO_URL)
+    }
+
+
+def run_benchmarks(names: list = None) -> dict:
+    """
+    Runs benchmarks, every one is timed REPEATS times and the best timing is taken.
+    Timings of different benchmarks are interleaved, so a slow period of the machine doesn't hit all timings
+    of one benchmark
+    :param names: benchmarks to run, all if empty
+    :return: {name: seconds per operation}
+    """
+    timers = {}
+    for name, operation in get_benchmarks().items():
+        if names and name not in names and name != CALIBRATION_NAME:
+            continue
+        operation()  # warm up lazy imports and caches
+        timer = timeit.Timer(operation)
+        number = 1
+        while timer.timeit(number) < MIN_TIMING_SECONDS:
+            number *= 2
+        timers[name] = (timer, number)
+    results = {name: float('inf') for name in timers}
+    for _ in range(REPEATS):
+        for name, (timer, number) in timers.items():
+            results[name] = min(results[name], timer.timeit(number) / number)
+    return results
+
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints results table and returns names of regressed benchmarks.
+    Ratio to baseline is normalized by calibration workload ratio
+    :param results: current results {name: seconds per operation}
+    :param baseline: baseline results {name: seconds per operation}
+    :param threshold: max allowed ratio of current and baseline timings
+    """
+    machine_ratio = 1.0
+    if CALIBRATION_NAME in baseline:
+        machine_ratio = results[CALIBRATION_NAME] / baseline[CALIBRATION_NAME]
+    print(f'Machine speed ratio to baseline: {machine_ratio:.2f}')
+    regressions = []
+    print(f'{"benchmark":40} {"current, us":>12} {"baseline, us":>13} {"ratio":>7}')
+    for name, seconds in results.items():
+        if name == CALIBRATION_NAME:
+            continue
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds is None:
+            print(f'{name:40} {seconds * 1e6:12.1f} {"-":>13} {"-":>7}')
+            continue
+        ratio = seconds / baseline_seconds / machine_ratio
+        is_regressed = ratio > threshold
+        if is_regressed:
+            regressions.append(name)
+        print(f'{name:40} {seconds * 1e6:12.1f} {baseline_seconds * 1e6:13.1f} {ratio:7.2f}'
+              f'{"  REGRESSION" if is_regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of RepositoryCloner hot paths')
+    parser.add_argument('names', nargs='*', help='benchmarks to run (all if not set)')
+    parser.add_argument('--baseline', default=BASELINE_FILE_PATH, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='write results as baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fail if benchmark is slower than baseline by this ratio')
+    args = parser.parse_args()
+    results = run_benchmarks(args.names)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f'Baseline is written to {args.baseline}')
+        return
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f'Regressed: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
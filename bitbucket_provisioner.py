@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from step_plugins import ClientRegistry
+
+REPO_LIST_PAGE_SIZE = 1000
+
+
+class BitbucketProvisioner:
+    def __init__(self, logger, workers: int):
+        """
+        Prepares BitBucket repos of the whole wave before any git work starts.
+        Existing repos of every target BitBucket project are listed once (paginated), webhooks of existing repos
+        which need webhook are listed in one concurrent batch, then only missing repos are created, deleted
+        or configured, repos are processed concurrently.
+        Every repo is provisioned with clients of its cloner, so targets can be in different BitBucket instances
+        :param workers: number of repos provisioned in parallel
+        """
+        self.__logger = logger
+        self.__workers = workers
+
+    def __list_project_repos(self, clients: ClientRegistry, project_key: str) -> dict:
+        """
+        Lists existing repos of BitBucket project
+        :param clients: clients of BitBucket instance
+        :param project_key: BitBucket project key
+        :return: dict {repo slug or name in lower case: repo info}
+        """
+        project_repos = {}
+        for bb_repo in clients.bitbucket.repo_list(project_key, limit=REPO_LIST_PAGE_SIZE):
+            project_repos[bb_repo['slug'].lower()] = bb_repo
+            project_repos[bb_repo['name'].lower()] = bb_repo
+        self.__logger.info(f'BitBucket project [{project_key}] has {len(project_repos)} repos')
+        return project_repos
+
+    @staticmethod
+    def __get_project_id(repo) -> tuple:
+        """
+        Returns BitBucket project id unique across BitBucket instances: (instance url, project key)
+        """
+        return repo.main_params["bitbucket_api_url"], repo.bitbucket_project
+
+    @staticmethod
+    def __is_webhook_checked(repo, repo_cloner, project_repos: dict) -> bool:
+        """
+        Returns if repo's webhooks have to be listed: webhook is needed and repo exists and isn't deleted
+        """
+        return repo.will_webhook_be_enabled and not repo.will_bitbucket_repo_be_deleted_at_start_if_exists and \
+            repo_cloner.bitbucket_repo_name.lower() in project_repos
+
+    def __list_webhooks(self, targets: list, projects_repos: dict) -> dict:
+        """
+        Lists webhooks names of existing repos of the wave which need webhook, in one concurrent batch.
+        BitBucket has no project-wide list of repos webhooks, so every such repo is listed (paginated) once
+        :param targets: list of tuples (repo config, repo's cloner)
+        :param projects_repos: existing repos by BitBucket project id
+        :return: dict {BitBucket target name: set of webhooks names}
+        """
+        checked_targets = [(repo, repo_cloner) for repo, repo_cloner in targets
+                           if self.__is_webhook_checked(repo, repo_cloner,
+                                                        projects_repos[self.__get_project_id(repo)])]
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            webhooks_names = list(executor.map(
+                lambda target: {webhook.get('name') for webhook in target[1].clients.bitbucket.get_webhooks(
+                    target[0].bitbucket_project, target[1].bitbucket_repo_name)},
+                checked_targets
+            ))
+        self.__logger.info(f'Webhooks of {len(checked_targets)} existing BitBucket repos listed')
+        return {repo_cloner.bitbucket_target_name: names
+                for (_, repo_cloner), names in zip(checked_targets, webhooks_names)}
+
+    def __provision_repo(self, repo, repo_cloner, project_repos: dict, webhooks_names: dict) -> set:
+        """
+        Makes BitBucket repo steps for single repo and hands repo info to its cloner
+        :param repo: repo config
+        :param repo_cloner: repo's RepositoryCloner
+        :param project_repos: existing repos of repo's BitBucket project
+        :param webhooks_names: webhooks names of existing repos {BitBucket target name: set of names}
+        :return: names of steps which were made
+        """
+        done_steps = set()
+        bb_repo = project_repos.get(repo_cloner.bitbucket_repo_name.lower())
+        if repo.will_bitbucket_repo_be_deleted_at_start_if_exists:
+            if bb_repo is not None:
+                repo_cloner.delete_bitbucket_repo()
+                bb_repo = None
+            else:
+                # repo was deleted outside of the tool, its PRs are gone too
+                repo_cloner.reset_migration_state()
+            done_steps.add('delete_bitbucket_repo')
+        is_created = False
+        if repo.will_gitlab_repo_be_cloned:
+            if bb_repo is None:
+                repo_cloner.create_bitbucket_repo()
+                is_created = True
+            else:
+                repo_cloner.set_bitbucket_repo(bb_repo)
+            done_steps.add('create_bitbucket_repo')
+        elif bb_repo is not None:
+            repo_cloner.set_bitbucket_repo(bb_repo)
+        if repo.will_webhook_be_enabled and (is_created or bb_repo is not None):
+            # new repo has no webhooks, existing repo's webhooks are checked to avoid duplicates
+            if is_created or repo.webhook_name not in webhooks_names.get(repo_cloner.bitbucket_target_name, ()):
+                repo_cloner.enable_webhook_for_bb_repo()
+            done_steps.add('webhook')
+        return done_steps
+
+    def provision(self, repos: list) -> dict:
+        """
+        Provisions BitBucket repos of the wave
+        :param repos: list of tuples (repo config, repo's cloner), every BitBucket target of cloner is provisioned
+        :return: dict {BitBucket target name: names of steps which were made and don't need to be run again}
+        """
+        targets = [target for _, repo_cloner in repos for target in repo_cloner.targets]
+        projects_repos = {}
+        for repo, repo_cloner in targets:
+            if self.__get_project_id(repo) not in projects_repos:
+                projects_repos[self.__get_project_id(repo)] = self.__list_project_repos(repo_cloner.clients,
+                                                                                        repo.bitbucket_project)
+        webhooks_names = self.__list_webhooks(targets, projects_repos)
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            done_steps = list(executor.map(
+                lambda target: self.__provision_repo(*target, projects_repos[self.__get_project_id(target[0])],
+                                                     webhooks_names),
+                targets
+            ))
+        self.__logger.info(f'=== {len(targets)} BitBucket repos of {len(repos)} Gitlab repos provisioned ===')
+        return {repo_cloner.bitbucket_target_name: steps for (_, repo_cloner), steps in zip(targets, done_steps)}
@@ -0,0 +1,127 @@
+import queue
+import threading
+
+DEFAULT_PREFETCH_SIZE = 100
+
+_END_OF_ITEMS = object()
+
+
+def prefetch(iterable, max_items: int = DEFAULT_PREFETCH_SIZE):
+    """
+    Iterates over iterable in background thread, so next pages are read while current items are processed.
+    Reader stays at most max_items ahead of consumer, so memory is bounded by max_items, not by iterable size
+    :param iterable: iterable to read (f.e. lazy paginated API list)
+    :param max_items: max number of read but not consumed items
+    :return: generator of iterable's items, reader's exception is re-raised in consumer
+    """
+    items = queue.Queue(maxsize=max_items)
+    is_stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not is_stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as err:
+            put((_END_OF_ITEMS, err))
+            return
+        put((_END_OF_ITEMS, None))
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _END_OF_ITEMS:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        is_stopped.set()
+
+
+class FanOutConsumer:
+    def __init__(self, max_items: int):
+        """
+        Consumer of items read by fan_out, keeps at most max_items not consumed items
+        """
+        self.__items = queue.Queue(maxsize=max_items)
+        self.__is_closed = threading.Event()
+
+    def put(self, item) -> bool:
+        """
+        Waits for free place and puts item
+        :return: was item put (False if consumer is closed)
+        """
+        while not self.__is_closed.is_set():
+            try:
+                self.__items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        """
+        Stops feeding consumer, so reader isn't held back by consumer which won't read anymore
+        """
+        self.__is_closed.set()
+
+    def __iter__(self):
+        try:
+            while True:
+                try:
+                    item, error = self.__items.get(timeout=0.1)
+                except queue.Empty:
+                    if self.__is_closed.is_set():
+                        return
+                    continue
+                if item is _END_OF_ITEMS:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            self.close()
+
+
+def fan_out(iterable, consumers_count: int, max_items: int = DEFAULT_PREFETCH_SIZE) -> list:
+    """
+    Reads iterable once in background thread and hands every item to every consumer.
+    Reader stays at most max_items ahead of the slowest consumer, closed consumers aren't waited for,
+    reading stops when all consumers are closed
+    :param iterable: iterable to read (f.e. lazy paginated API list)
+    :param consumers_count: number of consumers
+    :param max_items: max number of read but not consumed items per consumer
+    :return: list of FanOutConsumer, every one iterates over all items, reader's exception is re-raised in consumers
+    """
+    consumers = [FanOutConsumer(max_items) for _ in range(consumers_count)]
+
+    def put_to_all(item, error=None) -> bool:
+        is_put = False
+        for consumer in consumers:
+            is_put = consumer.put((item, error)) or is_put
+        return is_put
+
+    def read():
+        try:
+            for item in iterable:
+                if not put_to_all(item):
+                    return
+        except BaseException as err:
+            put_to_all(_END_OF_ITEMS, err)
+            return
+        put_to_all(_END_OF_ITEMS)
+
+    threading.Thread(target=read, daemon=True).start()
+    return consumers
@@ -0,0 +1,96 @@
+import threading
+
+
+class CloneJob:
+    def __init__(self, name: str, size: int, run):
+        """
+        Repo migration job
+        :param name: repo name for logs
+        :param size: projected local disk use in bytes
+        :param run: callable making migration, returns True if local disk space was freed after it
+        """
+        self.name = name
+        self.size = size
+        self.run = run
+
+
+class CloneScheduler:
+    def __init__(self, logger, workers: int = 1, disk_budget: int = None):
+        """
+        Runs repo migration jobs largest-first, so the biggest repos don't end up at the tail of the run.
+        New job is started only while projected local disk use fits the budget
+        (job that doesn't fit even alone is started when no other job runs).
+        :param workers: number of jobs run in parallel
+        :param disk_budget: local disk budget in bytes, no limit if None
+        """
+        self.__logger = logger
+        self.__workers = workers
+        self.__disk_budget = disk_budget
+        self.__condition = threading.Condition()
+        self.__pending = []
+        self.__running = 0
+        self.__disk_used = 0
+        self.__error = None
+
+    def __fits(self, job: CloneJob) -> bool:
+        if self.__disk_budget is None or self.__running == 0:
+            return True
+        return self.__disk_used + job.size <= self.__disk_budget
+
+    def __take_job(self):
+        """
+        Waits for the largest pending job which fits the disk budget
+        :return: job or None if there are no more jobs to run
+        """
+        with self.__condition:
+            while True:
+                if not self.__pending or self.__error is not None:
+                    return None
+                # pending jobs are sorted largest-first, smaller jobs backfill the budget left
+                for job in self.__pending:
+                    if self.__fits(job):
+                        self.__pending.remove(job)
+                        self.__running += 1
+                        self.__disk_used += job.size
+                        return job
+                self.__condition.wait()
+
+    def __release_job(self, job: CloneJob, is_disk_freed: bool):
+        with self.__condition:
+            self.__running -= 1
+            if is_disk_freed:
+                self.__disk_used -= job.size
+            self.__condition.notify_all()
+
+    def __worker(self):
+        while True:
+            job = self.__take_job()
+            if job is None:
+                return
+            is_disk_freed = False
+            try:
+                self.__logger.debug(f'Starting job [{job.name}], projected disk use {job.size} bytes, '
+                                    f'total {self.__disk_used} bytes')
+                is_disk_freed = bool(job.run())
+            except BaseException as err:
+                with self.__condition:
+                    if self.__error is None:
+                        self.__error = err
+            finally:
+                self.__release_job(job, is_disk_freed)
+
+    def run(self, jobs: list):
+        """
+        Runs all jobs, first job exception stops starting new jobs and is re-raised after running jobs end
+        :param jobs: list of CloneJob
+        """
+        self.__pending = sorted(jobs, key=lambda job: job.size, reverse=True)
+        self.__error = None
+        workers = [threading.Thread(target=self.__worker, name=f'clone-worker-{i}')
+                   for i in range(min(self.__workers, len(jobs)))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if self.__error is not None:
+            raise self.__error
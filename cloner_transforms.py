@@ -0,0 +1,140 @@
+import xml.etree.ElementTree as ElT
+
+GITLAB_TIMESTAMP_FORMAT = "%d.%m.%Y, %H:%M:%S"
+MARKDOWN_UPLOADS_LINKS = ('](/uploads/', '](uploads/', '] (/uploads/', '] (uploads/')
+JENKINS_REPO_URL_PARAMETER = 'PROJECT_GIT'
+
+
+def replace_markdown_links(text: str, gitlab_project_web_url: str) -> str:
+    """
+    Replaces links with images, etc. in Markdown text
+    :param text: text in which links needs replacement
+    :param gitlab_project_web_url: Gitlab project web url, uploads are stored under it
+    :return: text with replaced links
+    """
+    # We need to add full path to images, etc in descriptions, comments and so on.
+    # Because of Markdown in Gitlab. Check and insert full path
+    if '(' not in text:
+        return text
+    # Substring for replacing links to images, etc in PR descriptions
+    markdown_replace_string = f']({gitlab_project_web_url}/uploads/'
+    for uploads_link in MARKDOWN_UPLOADS_LINKS:
+        text = text.replace(uploads_link, markdown_replace_string)
+    return text
+
+
+def format_gitlab_timestamp(created_at: str) -> str:
+    """
+    Formats Gitlab API timestamp (ISO 8601) for comments headers
+    :param created_at: Gitlab timestamp
+    :return: formatted timestamp
+    """
+    from dateutil.parser import parse  # for datetime parsing
+    return parse(created_at).strftime(GITLAB_TIMESTAMP_FORMAT)
+
+
+def format_pr_header_comment(author: str, created_at: str) -> str:
+    """
+    Returns text of PR comment with Gitlab's MR creation date and creator name
+    :param author: MR author name
+    :param created_at: MR Gitlab timestamp
+    """
+    return f'This pull request was created in Gitlab \non {format_gitlab_timestamp(created_at)} \nby {author}'
+
+
+def format_comment_text(author: str, created_at: str, text: str) -> str:
+    """
+    Returns text of PR comment copied from MR comment: header with author and date, then comment body
+    :param author: MR comment author name
+    :param created_at: MR comment Gitlab timestamp
+    :param text: MR comment body (links already replaced)
+    """
+    return f"Created by {author} \nOn {format_gitlab_timestamp(created_at)} \n{text}"
+
+
+def get_comment_to_codeline_creation_request_data(mr_comment_position: dict, comment_text: str) -> dict:
+    """
+    Returns data for request to create comment to code line in Bitbucket repo's pull request.
+    Anchor's "lineType" is empty if position has no line numbers at all
+    :param mr_comment_position: Gitlab MR comment position
+    :param comment_text: comment text
+    :return: comment to codeline creation request data
+    """
+    # Determining how and where to put comment
+    # does comment has string number in file's new version
+    is_newline = mr_comment_position['new_line'] is not None
+    # does comment has string number in file's old version
+    is_oldline = mr_comment_position['old_line'] is not None
+    line_number = 0  # comment's string number in file
+    linetype = ''  # comment's string type: deleted, added or not changed
+    filetype = ''  # comment's file type: "old" (before commit) or "new" (committed)
+    if not is_newline and is_oldline:
+        # has old line but not new - comment to deleted line
+        linetype = "REMOVED"
+        line_number = int(mr_comment_position['old_line'])
+        filetype = "FROM"
+    elif is_newline and not is_oldline:
+        # has new line but not old - comment to added line
+        linetype = "ADDED"
+        line_number = int(mr_comment_position['new_line'])
+        filetype = "TO"
+    elif is_newline and is_oldline:
+        # both lines present - comment to remained line
+        linetype = "CONTEXT"
+        line_number = int(mr_comment_position['old_line'])
+        filetype = "FROM"
+    # gathering body for request to BB API
+    comment_body = {
+        "text": comment_text,
+        "severity": "NORMAL",
+        "anchor": {
+            "diffType": "EFFECTIVE",
+            "path": mr_comment_position['new_path'],
+            "lineType": linetype,
+            "line": line_number,
+            "fileType": filetype
+        }
+    }
+    # if in GL MR comment old and new file names are not equal,
+    # then it is renaming, and we need to send toBB old path
+    if mr_comment_position['new_path'] != mr_comment_position['old_path']:
+        comment_body["anchor"]["srcPath"] = mr_comment_position['old_path']
+    return comment_body
+
+
+def get_failed_branches(push_output: str) -> list:
+    """
+    Returns branches rejected by remote from "git push" output
+    :param push_output: "git push" output
+    :return: list of failed branch names
+    """
+    if '[rejected]' not in push_output:
+        return []
+    failed_branches = []
+    for line in push_output.splitlines():
+        if '[rejected]' in line:
+            line_elements = line.split()
+            failed_branches.append(line_elements[line_elements.index('->') + 1])
+    return failed_branches
+
+
+def rewrite_jenkins_job_config(xml_job_config: str, bitbucket_repo_url: str) -> str:
+    """
+    Sets BitBucket repo url as default value of job's repo url string parameter,
+    old and new urls are put to parameter's description
+    :param xml_job_config: Jenkins job XML config
+    :param bitbucket_repo_url: BitBucket repo url
+    :return: new job XML config
+    """
+    # parsing XML config
+    xml_root = ElT.fromstring(xml_job_config)
+    # in string parameters looking for those which has in tag <name> value "PROJECT_GIT"
+    for parameter in xml_root.iter('hudson.model.StringParameterDefinition'):
+        if parameter.find('name').text == JENKINS_REPO_URL_PARAMETER:
+            gl_repo_url = parameter.find('defaultValue').text  # storing old URL
+            # creating param's description and putting both old and new URL there
+            parameter.find('description').text = f"{bitbucket_repo_url} --- {gl_repo_url}"
+            # changing default value
+            parameter.find('defaultValue').text = bitbucket_repo_url
+    # converting XML-object to sting
+    return ElT.tostring(xml_root, encoding='utf8').decode()
@@ -2,12 +2,37 @@
 
 import json
 from os import getenv
+from urllib.parse import urlparse
 
-import jsonschema
 import yaml
 
+
 CONF_FILE_PATH = 'migration_config.yaml'
 JSON_SCHEMA_FILE_PATH = 'conf_schema.json'
+DEFAULT_VERIFY_WORKERS = 16
+DEFAULT_SYNC_POLL_INTERVAL = 60
+DEFAULT_SYNC_WORKERS = 8
+DEFAULT_REPO_WORKERS = 1
+DEFAULT_STEP_WORKERS = 4
+DEFAULT_PROVISION_WORKERS = 16
+DEFAULT_API_PAGE_SIZE = 100
+DEFAULT_EXPORT_WORKERS = 4
+DEFAULT_REPACK_WINDOW = 50
+DEFAULT_REPACK_DEPTH = 50
+DEFAULT_BITBUCKET_TOKEN_ENV = 'BITBUCKET_TOKEN'
+DEFAULT_SSH_MAX_SESSIONS = 8
+DEFAULT_SSH_CONTROL_PERSIST = 300
+
+
+def get_http_base_url(url: str) -> str:
+    """
+    Returns url with scheme (https if not set) and trailing slash
+    """
+    if not url.startswith('http'):
+        url = 'https://' + url
+    if not url.endswith('/'):
+        url += '/'
+    return url
 
 
 class RepoConfig:
@@ -25,6 +50,31 @@ class RepoConfig:
     def main_params(self):
         return self.__main_params
 
+    @property
+    def targets(self) -> list:
+        """
+        BitBucket targets of the repo: this config first, then configs of additional targets ("targets" list).
+        Additional target has its own BitBucket project and prefix and can be in another BitBucket instance
+        (sBitbucketUrl, sBBUser and env variable with token sBitbucketTokenEnv), the rest params are the repo's
+        """
+        targets = [self]
+        for target_params in self.__repo.get("targets", []):
+            repo_params = {key: value for key, value in self.__repo.items() if key != "targets"}
+            repo_params["sBitbucketProject"] = target_params["sBitbucketProject"]
+            repo_params["sBitbucketPrefix"] = target_params["sBitbucketPrefix"]
+            main_params = self.__main_params
+            if "sBitbucketUrl" in target_params:
+                bitbucket_url = get_http_base_url(target_params["sBitbucketUrl"])
+                main_params = dict(self.__main_params)
+                main_params["bitbucket_api_url"] = bitbucket_url
+                main_params["bitbucket_username"] = target_params.get("sBBUser", main_params["bitbucket_username"])
+                main_params["bitbucket_token"] = getenv(target_params.get("sBitbucketTokenEnv",
+                                                                          DEFAULT_BITBUCKET_TOKEN_ENV))
+                # the same project and repo names can exist in both instances
+                main_params["state_path"] = f'{main_params["state_path"]}{urlparse(bitbucket_url).netloc}/'
+            targets.append(RepoConfig(repo_params, self.__defaults, main_params))
+        return targets
+
     @property
     def bitbucket_project(self):
         return self.__repo["sBitbucketProject"]
@@ -91,6 +141,18 @@ class RepoConfig:
     def will_jenkins_jobs_be_backed_up(self):
         return self.__repo.get("bBackupJenkinsJobs", self.__defaults["will_jenkins_jobs_be_backed_up"])
 
+    @property
+    def will_refs_be_verified(self):
+        return self.__repo.get("bVerify", self.__defaults["will_refs_be_verified"])
+
+    @property
+    def will_repo_be_repacked(self):
+        return self.__repo.get("bRepack", self.__defaults["will_repo_be_repacked"])
+
+    @property
+    def will_project_export_be_used(self):
+        return self.__repo.get("bProjectExport", self.__defaults["will_project_export_be_used"])
+
     @property
     def will_webhook_be_enabled(self):
         return self.webhook_url is not None and self.webhook_url is not None
@@ -120,7 +182,10 @@ class MigrationConfig:
             'will_MRs_will_be_cloned': self.__yaml_conf.get('bDefaultDuplicateMRs', False),
             'will_local_tmp_be_deleted': self.__yaml_conf.get('bDefaultClear', True),
             'will_jenkins_jobs_will_be_changed': self.__yaml_conf.get('bDefaultChangeJenkinsJobs', False),
-            'will_jenkins_jobs_be_backed_up': self.__yaml_conf.get('bDefaultBackupJenkinsJobs', True)
+            'will_jenkins_jobs_be_backed_up': self.__yaml_conf.get('bDefaultBackupJenkinsJobs', True),
+            'will_refs_be_verified': self.__yaml_conf.get('bDefaultVerify', False),
+            'will_repo_be_repacked': self.__yaml_conf.get('bDefaultRepack', False),
+            'will_project_export_be_used': self.__yaml_conf.get('bDefaultProjectExport', False)
         }
         self.__main_params = {
             "bitbucket_api_url": self.bitbucket_base_url,
@@ -135,6 +200,13 @@ class MigrationConfig:
             "jenkins_token": self.jenkins_token,
             "jenkins_backup_path": self.jenkins_backup_path,
             "tmp_folder": self.tmp_folder,
+            "state_path": self.state_path,
+            "sync_mirrors_path": self.sync_mirrors_path,
+            "api_page_size": self.api_page_size,
+            "merge_requests_source": self.merge_requests_source,
+            "repack_threads": self.repack_threads,
+            "repack_window": self.repack_window,
+            "repack_depth": self.repack_depth,
             'webhook_name': self.webhook_name,
             'webhook_url': self.webhook_url
         }
@@ -166,12 +238,7 @@ class MigrationConfig:
 
     @property
     def bitbucket_base_url(self):
-        url = self.__yaml_conf["sBitbucketUrl"]
-        if not url.startswith('http'):
-            url = 'https://' + url
-        if not url.endswith('/'):
-            url += '/'
-        return url
+        return get_http_base_url(self.__yaml_conf["sBitbucketUrl"])
 
     @property
     def jenkins_base_url(self):
@@ -210,7 +277,7 @@ class MigrationConfig:
 
     @property
     def bitbucket_token(self):
-        return getenv("BITBUCKET_TOKEN")
+        return getenv(DEFAULT_BITBUCKET_TOKEN_ENV)
 
     @property
     def jenkins_user(self):
@@ -237,6 +304,111 @@ class MigrationConfig:
     def webhook_url(self):
         return self.__yaml_conf.get('sDefaultWebhookUrl')
 
+    @property
+    def verify_workers(self):
+        return self.__yaml_conf.get('iVerifyWorkers', DEFAULT_VERIFY_WORKERS)
+
+    @property
+    def repo_workers(self):
+        return self.__yaml_conf.get('iRepoWorkers', DEFAULT_REPO_WORKERS)
+
+    @property
+    def step_workers(self):
+        return self.__yaml_conf.get('iStepWorkers', DEFAULT_STEP_WORKERS)
+
+    @property
+    def api_page_size(self):
+        return self.__yaml_conf.get('iApiPageSize', DEFAULT_API_PAGE_SIZE)
+
+    @property
+    def merge_requests_source(self):
+        return self.__yaml_conf.get('sMergeRequestSource', 'rest')
+
+    @property
+    def provision_workers(self):
+        return self.__yaml_conf.get('iProvisionWorkers', DEFAULT_PROVISION_WORKERS)
+
+    @property
+    def state_path(self):
+        path = self.__yaml_conf.get("sStatePath", f'{self.tmp_folder}_state/')
+        if path.startswith("~"):
+            path = getenv("HOME") + path[1:]
+        if not path.endswith('/'):
+            path += '/'
+        return path
+
+    @property
+    def tmp_folder_budget(self):
+        """
+        Local disk budget for repos clones in bytes, None if not limited
+        """
+        budget_mb = self.__yaml_conf.get('iLocalRootPathBudgetMb')
+        return None if budget_mb is None else budget_mb * 1024 * 1024
+
+    @property
+    def repack_threads(self):
+        # None means CPUs available to the process, resolved by repack
+        return self.__yaml_conf.get('iRepackThreads')
+
+    @property
+    def repack_window(self):
+        return self.__yaml_conf.get('iRepackWindow', DEFAULT_REPACK_WINDOW)
+
+    @property
+    def repack_depth(self):
+        return self.__yaml_conf.get('iRepackDepth', DEFAULT_REPACK_DEPTH)
+
+    @property
+    def export_path(self):
+        path = self.__yaml_conf.get("sExportPath", f'{self.tmp_folder}_archives/')
+        if path.startswith("~"):
+            path = getenv("HOME") + path[1:]
+        if not path.endswith('/'):
+            path += '/'
+        return path
+
+    @property
+    def export_workers(self):
+        return self.__yaml_conf.get('iExportWorkers', DEFAULT_EXPORT_WORKERS)
+
+    @property
+    def project_exports_path(self):
+        path = self.__yaml_conf.get("sProjectExportsPath", f'{self.tmp_folder}_gitlab_exports/')
+        if path.startswith("~"):
+            path = getenv("HOME") + path[1:]
+        if not path.endswith('/'):
+            path += '/'
+        return path
+
+    @property
+    def sync_mirrors_path(self):
+        path = self.__yaml_conf.get("sSyncMirrorsPath", f'{self.tmp_folder}_sync/')
+        if path.startswith("~"):
+            path = getenv("HOME") + path[1:]
+        if not path.endswith('/'):
+            path += '/'
+        return path
+
+    @property
+    def sync_poll_interval(self):
+        return self.__yaml_conf.get('iSyncPollInterval', DEFAULT_SYNC_POLL_INTERVAL)
+
+    @property
+    def sync_workers(self):
+        return self.__yaml_conf.get('iSyncWorkers', DEFAULT_SYNC_WORKERS)
+
+    @property
+    def ssh_multiplexing(self):
+        return self.__yaml_conf.get('bSshMultiplexing', True)
+
+    @property
+    def ssh_max_sessions(self):
+        return self.__yaml_conf.get('iSshMaxSessions', DEFAULT_SSH_MAX_SESSIONS)
+
+    @property
+    def ssh_control_persist(self):
+        return self.__yaml_conf.get('iSshControlPersist', DEFAULT_SSH_CONTROL_PERSIST)
+
     @property
     def repos(self):
         return self.__repos
@@ -258,6 +430,7 @@ class MigrationConfig:
         :param json_schema_file_path: path to json schema
         :return:
         """
+        import jsonschema
         with open(json_schema_file_path) as schema_file:
             schema = json.load(schema_file)
         jsonschema.validate(instance=self.__yaml_conf, schema=schema)
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from delta_sync import DeltaSync
+from log_pipeline import log_context
+
+
+class RepoCutover:
+    def __init__(self, repo_cloner, sync_targets: list):
+        """
+        Repo switched from Gitlab to BitBucket by cutover
+        :param repo_cloner: repo's cloner (RepositoryCloner or MultiTargetCloner), its BitBucket repos were made
+                            by warm phase
+        :param sync_targets: RepoSyncTarget of every BitBucket target with persistent mirror made by warm phase
+        """
+        self.repo_cloner = repo_cloner
+        self.sync_targets = sync_targets
+
+
+class CutoverRunner:
+    def __init__(self, logger, delta_sync: DeltaSync, workers: int):
+        """
+        Second phase of two-phase migration. Warm phase has already cloned, pushed and copied MRs
+        while Gitlab repo stayed writable, so cutover moves only what changed since then:
+        changed refs are caught up, Gitlab project is archived, refs changed till archiving are transferred,
+        new MRs and notes are copied. Freeze window (from archiving till BitBucket repo has everything) is measured
+        :param delta_sync: transfers changed refs through persistent mirrors
+        :param workers: number of repos switched in parallel
+        """
+        self.__logger = logger
+        self.__delta_sync = delta_sync
+        self.__workers = workers
+
+    def __sync_refs(self, repo_cutover: RepoCutover) -> int:
+        """
+        Transfers changed refs to all targets
+        :return: number of transferred refs, -1 if sync of any target failed
+        """
+        results = [self.__delta_sync.sync_repo(sync_target) for sync_target in repo_cutover.sync_targets]
+        return -1 if any(result < 0 for result in results) else sum(results)
+
+    def cutover_repo(self, repo_cutover: RepoCutover) -> dict:
+        """
+        Switches single repo
+        :param repo_cutover: repo to switch
+        :return: report {"repo", "ok", "freeze_seconds", "refs_before_freeze", "refs_in_freeze", "refs_differ",
+                 "error"}, Gitlab project isn't archived if refs can't be caught up before freeze
+        """
+        repo_cloner = repo_cutover.repo_cloner
+        report = {"repo": repo_cloner.repo_full_name, "ok": False, "freeze_seconds": None, "refs_in_freeze": None,
+                  "refs_differ": None, "error": None}
+        with log_context(repo=repo_cloner.repo_full_name), repo_cloner:
+            # refs pushed since warm phase are caught up while developers still work in Gitlab
+            report["refs_before_freeze"] = self.__sync_refs(repo_cutover)
+            if report["refs_before_freeze"] < 0:
+                # nothing is archived if refs can't be transferred, developers keep working in Gitlab
+                self.__logger.error(f'Cutover of repo [{repo_cloner.repo_full_name}] is not started: '
+                                    f'refs were not caught up, Gitlab project is not archived')
+                report["error"] = 'refs were not caught up before freeze'
+                return report
+            freeze_start = time.monotonic()
+            try:
+                with log_context(step='archive'):
+                    if not repo_cloner.archive_gitlab_project():
+                        self.__logger.warning(f'Gitlab repo [{repo_cloner.repo_full_name}] is not archived '
+                                              f'(bMakeGitlabRepoReadonly is off), it can change after cutover')
+                with log_context(step='sync'):
+                    report["refs_in_freeze"] = self.__sync_refs(repo_cutover)
+                with log_context(step='merge_requests'):
+                    repo_cloner.copy_merge_requests_from_gl_to_bb()
+                with log_context(step='verify'):
+                    # refs of every target are compared, whatever bVerify is
+                    refs_reports = [target_cloner.get_refs_report() for _, target_cloner in repo_cloner.targets]
+                report["refs_differ"] = [refs_report["target"] for refs_report in refs_reports
+                                         if not refs_report["ok"]]
+                report["ok"] = report["refs_in_freeze"] >= 0 and not report["refs_differ"]
+                if report["refs_differ"]:
+                    report["error"] = f'refs of {len(report["refs_differ"])} BitBucket repos differ from Gitlab repo'
+            except BaseException as err:
+                self.__logger.error(f'Cutover of repo [{repo_cloner.repo_full_name}] failed: {err!r}')
+                report["error"] = repr(err)
+            report["freeze_seconds"] = round(time.monotonic() - freeze_start, 3)
+            self.__logger.info(f'Repo [{repo_cloner.repo_full_name}] freeze window: {report["freeze_seconds"]} s, '
+                               f'{report["refs_in_freeze"]} refs transferred in it')
+            if report["ok"]:
+                # Jenkins jobs are switched to BitBucket repo when it has everything, it's outside the freeze
+                try:
+                    with log_context(step='jenkins'):
+                        repo_cloner.change_jenkins_jobs()
+                except BaseException as err:
+                    self.__logger.error(f'Jenkins jobs of repo [{repo_cloner.repo_full_name}] '
+                                        f'were not changed: {err!r}')
+                    report.update({"ok": False, "error": repr(err)})
+        return report
+
+    def run(self, repo_cutovers: list) -> list:
+        """
+        Switches repos, repos are switched in parallel
+        :param repo_cutovers: list of RepoCutover
+        :return: list of reports
+        """
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            reports = list(executor.map(self.cutover_repo, repo_cutovers))
+        freeze_windows = [report["freeze_seconds"] for report in reports if report["freeze_seconds"] is not None]
+        self.__logger.info(f'=== Cutover of {len(reports)} repos: '
+                           f'{len([report for report in reports if not report["ok"]])} failed, '
+                           f'max freeze window {max(freeze_windows, default=0)} s ===')
+        return reports
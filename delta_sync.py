@@ -0,0 +1,219 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import shutil
+import time
+
+from git_commands import run_git
+from ref_verifier import diff_refs, get_remote_refs
+
+SNAPSHOT_FILE_NAME = 'gmu_refs_snapshot.json'
+TARGET_REMOTE_NAME = 'bitbucket'
+REFSPECS_PER_CMD = 200
+
+
+class RepoSyncTarget:
+    def __init__(self, repo_name: str, source_url: str, target_url: str, mirror_path: str):
+        """
+        Repo synced from Gitlab to BitBucket
+        :param repo_name: repo name for logs
+        :param source_url: Gitlab repo url
+        :param target_url: BitBucket repo url
+        :param mirror_path: path to persistent local mirror
+        """
+        self.repo_name = repo_name
+        self.source_url = source_url
+        self.target_url = target_url
+        self.mirror_path = mirror_path
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.mirror_path, SNAPSHOT_FILE_NAME)
+
+
+def get_sync_targets(repo_cloner, sync_mirrors_path: str, logger) -> list:
+    """
+    Returns sync targets of every BitBucket target of repo, targets whose BitBucket repo can't be got are skipped
+    :param repo_cloner: repo's cloner (RepositoryCloner or MultiTargetCloner)
+    :param sync_mirrors_path: folder for persistent local mirrors
+    :return: list of RepoSyncTarget
+    """
+    sync_targets = []
+    for target_number, (_, target_cloner) in enumerate(repo_cloner.targets):
+        # every target has its own mirror with its own refs snapshot
+        sync_name = repo_cloner.repo_full_name if target_number == 0 else \
+            f'{repo_cloner.repo_full_name}@{target_cloner.bitbucket_target_name.replace("/", "_")}'
+        try:
+            bitbucket_repo_url = target_cloner.get_bitbucket_repo_url()
+        except Exception as err:
+            logger.error(f'Repo [{sync_name}] will not be synced: {err}')
+            continue
+        # mirror is synced with Gitlab even if repo was cloned from archive or export bundle
+        sync_targets.append(RepoSyncTarget(sync_name, target_cloner.gitlab_remote_url, bitbucket_repo_url,
+                                           f'{sync_mirrors_path}{sync_name}.git'))
+    return sync_targets
+
+
+def seed_sync_mirrors(repo_cloner, local_path: str, sync_mirrors_path: str, logger) -> int:
+    """
+    Makes persistent mirrors of repo's sync targets from local mirror just pushed to them (objects are hardlinked
+    if both are on the same filesystem), so the first sync doesn't clone Gitlab repo again. Existing mirrors are kept
+    :param repo_cloner: repo's cloner (RepositoryCloner or MultiTargetCloner)
+    :param local_path: local mirror path
+    :param sync_mirrors_path: folder for persistent local mirrors
+    :return: number of mirrors made
+    """
+    seeded_count = 0
+    for target in get_sync_targets(repo_cloner, sync_mirrors_path, logger):
+        if os.path.exists(os.path.join(target.mirror_path, 'HEAD')):
+            continue
+        os.makedirs(os.path.dirname(target.mirror_path.rstrip('/')), exist_ok=True)
+        for args, workdir in ((['clone', '--mirror', local_path, target.mirror_path], None),
+                              (['remote', 'set-url', 'origin', target.source_url], target.mirror_path),
+                              (['remote', 'add', TARGET_REMOTE_NAME, target.target_url], target.mirror_path)):
+            cmd_output, cmd_result_code = run_git(args, workdir)
+            if cmd_result_code != 0:
+                # mirror is cloned from Gitlab by the first sync
+                logger.error(f'Mirror of repo [{target.repo_name}] was not made from local mirror: {cmd_output}')
+                shutil.rmtree(target.mirror_path, ignore_errors=True)
+                break
+        else:
+            seeded_count += 1
+    return seeded_count
+
+
+class DeltaSync:
+    def __init__(self, logger, poll_interval: int, workers: int):
+        """
+        Keeps BitBucket repos in sync with Gitlab repos.
+        Every poll Gitlab refs are got with git ls-remote and compared with snapshot of refs pushed to BitBucket,
+        only refs which were changed are fetched to persistent local mirror and pushed to BitBucket.
+        :param poll_interval: seconds between polls start
+        :param workers: number of repos synced in parallel
+        """
+        self.__logger = logger
+        self.__poll_interval = poll_interval
+        self.__workers = workers
+
+    def __exec_git(self, args: list, workdir: str = None) -> bool:
+        """
+        Runs git command and logs its output if failed
+        :param args: git arguments
+        :param workdir: directory to run command in
+        :return: was command successful
+        """
+        cmd_output, cmd_result_code = run_git(args, workdir)
+        if cmd_result_code != 0:
+            self.__logger.error(f'Command "git {" ".join(args)}" exited with error {cmd_result_code}:\n{cmd_output}')
+            return False
+        return True
+
+    def __load_snapshot(self, target: RepoSyncTarget) -> dict:
+        """
+        Loads refs snapshot, for new mirror snapshot is made from BitBucket refs
+        :param target: synced repo
+        :return: refs pushed to BitBucket {ref name: sha}
+        """
+        if os.path.exists(target.snapshot_path):
+            with open(target.snapshot_path, 'r') as snapshot_file:
+                return json.load(snapshot_file)
+        return get_remote_refs(target.target_url)
+
+    @staticmethod
+    def __save_snapshot(target: RepoSyncTarget, refs: dict):
+        tmp_snapshot_path = f'{target.snapshot_path}.tmp'
+        with open(tmp_snapshot_path, 'w') as snapshot_file:
+            json.dump(refs, snapshot_file, indent=1, sort_keys=True)
+        os.replace(tmp_snapshot_path, target.snapshot_path)
+
+    def __prepare_mirror(self, target: RepoSyncTarget) -> bool:
+        """
+        Creates local mirror if it doesn't exist. BitBucket remote is checked every time, so mirror whose setup
+        was interrupted (f.e. pod died after clone) gets it at the next poll
+        :param target: synced repo
+        :return: is mirror ready
+        """
+        if not os.path.exists(os.path.join(target.mirror_path, 'HEAD')):
+            self.__logger.info(f'Creating local mirror for repo [{target.repo_name}]')
+            os.makedirs(os.path.dirname(target.mirror_path.rstrip('/')), exist_ok=True)
+            if not self.__exec_git(['clone', '--mirror', target.source_url, target.mirror_path]):
+                shutil.rmtree(target.mirror_path, ignore_errors=True)
+                return False
+        target_url, cmd_result_code = run_git(['remote', 'get-url', TARGET_REMOTE_NAME], target.mirror_path)
+        if cmd_result_code != 0:
+            return self.__exec_git(['remote', 'add', TARGET_REMOTE_NAME, target.target_url], target.mirror_path)
+        if target_url != target.target_url:
+            return self.__exec_git(['remote', 'set-url', TARGET_REMOTE_NAME, target.target_url], target.mirror_path)
+        return True
+
+    def __transfer_refs(self, target: RepoSyncTarget, refs_to_update: list, refs_to_delete: list) -> bool:
+        """
+        Fetches changed refs from Gitlab and pushes them (and deletions) to BitBucket
+        :param target: synced repo
+        :param refs_to_update: refs which were created or moved in Gitlab
+        :param refs_to_delete: refs which were deleted in Gitlab
+        :return: were all refs transferred
+        """
+        is_ok = True
+        for i in range(0, len(refs_to_update), REFSPECS_PER_CMD):
+            refspecs = [f'+{ref}:{ref}' for ref in refs_to_update[i:i + REFSPECS_PER_CMD]]
+            is_ok = self.__exec_git(['fetch', 'origin', *refspecs], target.mirror_path) and \
+                self.__exec_git(['push', '--force', TARGET_REMOTE_NAME, *refspecs], target.mirror_path) and is_ok
+        for i in range(0, len(refs_to_delete), REFSPECS_PER_CMD):
+            refspecs = [f':{ref}' for ref in refs_to_delete[i:i + REFSPECS_PER_CMD]]
+            is_ok = self.__exec_git(['push', TARGET_REMOTE_NAME, *refspecs], target.mirror_path) and is_ok
+        return is_ok
+
+    def sync_repo(self, target: RepoSyncTarget) -> int:
+        """
+        Syncs refs of single repo
+        :param target: synced repo
+        :return: number of transferred refs, -1 if sync failed
+        """
+        try:
+            if not self.__prepare_mirror(target):
+                return -1
+            snapshot = self.__load_snapshot(target)
+            source_refs = get_remote_refs(target.source_url)
+        except Exception as err:
+            self.__logger.error(f'Repo [{target.repo_name}] was not synced: {err}')
+            return -1
+        refs_diff = diff_refs(source_refs, snapshot)
+        refs_to_update = list(refs_diff["missing"]) + list(refs_diff["divergent"])
+        refs_to_delete = list(refs_diff["extra"])
+        if not refs_to_update and not refs_to_delete:
+            self.__logger.debug(f'Repo [{target.repo_name}] is up to date')
+            return 0
+        self.__logger.info(f'Syncing repo [{target.repo_name}]: {len(refs_to_update)} refs to update, '
+                           f'{len(refs_to_delete)} refs to delete')
+        if not self.__transfer_refs(target, refs_to_update, refs_to_delete):
+            # snapshot isn't changed, so all refs of the repo will be retried at next poll
+            return -1
+        self.__save_snapshot(target, source_refs)
+        return len(refs_to_update) + len(refs_to_delete)
+
+    def sync_all(self, targets: list) -> list:
+        """
+        Syncs all repos once, repos are synced in parallel
+        :param targets: list of RepoSyncTarget
+        :return: list of transferred refs numbers (-1 for failed repos)
+        """
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            return list(executor.map(self.sync_repo, targets))
+
+    def run(self, targets: list, once: bool = False):
+        """
+        Syncs repos every poll interval until interrupted
+        :param targets: list of RepoSyncTarget
+        :param once: make single poll
+        """
+        while True:
+            poll_start = time.monotonic()
+            results = self.sync_all(targets)
+            poll_duration = time.monotonic() - poll_start
+            self.__logger.info(f'=== Sync poll finished in {poll_duration:.1f}s: '
+                               f'{sum(result for result in results if result > 0)} refs transferred, '
+                               f'{len([result for result in results if result < 0])} repos failed ===')
+            if once:
+                return
+            time.sleep(max(0.0, self.__poll_interval - poll_duration))
@@ -0,0 +1,39 @@
+from contextlib import contextmanager, nullcontext
+import subprocess
+
+from ssh_multiplexer import SshMultiplexer
+
+_ssh_multiplexer = None
+
+
+def set_ssh_multiplexer(ssh_multiplexer: SshMultiplexer):
+    """
+    Sets shared SSH master connections for all git commands of the run
+    :param ssh_multiplexer: SSH multiplexer, git commands open their own SSH connections if None
+    """
+    global _ssh_multiplexer
+    _ssh_multiplexer = ssh_multiplexer
+
+
+@contextmanager
+def git_env():
+    """
+    Environment for git subprocess while it runs
+    :return: environment with SSH multiplexing, None (current environment) if multiplexing is off
+    """
+    with nullcontext() if _ssh_multiplexer is None else _ssh_multiplexer.git_env() as env:
+        yield env
+
+
+def run_git(args: list, workdir: str = None, timeout: int = None) -> tuple:
+    """
+    Runs git command
+    :param args: git arguments (without "git")
+    :param workdir: directory to run command in
+    :param timeout: command timeout in seconds
+    :return: tuple (stdout + stderr output, return code)
+    """
+    with git_env() as env:
+        cmd_result = subprocess.run(['git', *args], cwd=workdir, stdin=subprocess.DEVNULL, env=env,
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout)
+    return cmd_result.stdout.decode().strip(), cmd_result.returncode
@@ -1,4 +1,4 @@
-import gitlab
+import threading
 
 
 class GitlabConnection:
@@ -12,26 +12,42 @@ class GitlabConnection:
         self.__logger = logger
         self.__url = api_url
         self.__token = token
+        import gitlab
         try:
             self.__connection = gitlab.Gitlab(api_url, ssl_verify=ssl_verify, private_token=token)
         except Exception as err:
             self.__logger.critical(f"Problem connecting to Gitlab: {err}")
             exit(1)
         self.__connection.auth()
+        self.__groups_cache = None
+        self.__groups_lock = threading.Lock()
 
     def __enter__(self):
         return self
 
-    def get_projects_from_group(self, group_name: str, project_name: str = None) -> list:
+    def __get_all_groups(self) -> list:
+        """
+        All Gitlab groups, they are listed once per connection
+        """
+        with self.__groups_lock:
+            if self.__groups_cache is None:
+                self.__groups_cache = self.__connection.groups.list(all=True)
+            return self.__groups_cache
+
+    def get_projects_from_group(self, group_name: str, project_name: str = None, statistics: bool = False,
+                                details: bool = True) -> list:
         """
         Get list of Gitlab projects in group by name (case-insensitive)
         :param group_name: name of Gitlab group
         :param project_name: name of Gitlab project
+        :param statistics: get projects with statistics (repository size, etc.)
+        :param details: get every project of group by its own request, projects as listed in group (path, id, ...)
+                        are returned if False
         :return: list of projects (properties example: project.path, project.id)
         """
         # Had to get all groups and then select one with name needed because method that returns group works with ID.
         # ".list" method has "search" param, but using it on prod Gitlab with many groups and projects got wrong results
-        all_groups = self.__connection.groups.list(all=True)
+        all_groups = self.__get_all_groups()
         for group in all_groups:
             if group.full_path.lower() == group_name.lower():
                 found_group = group
@@ -40,13 +56,15 @@ class GitlabConnection:
             self.__logger.warning(f"Group {group_name} not found in Gitlab")
             return []
         if project_name is None:
+            if not details:
+                return found_group.projects.list(all=True)
             projects = []
             for project in found_group.projects.list(all=True):
-                projects.append(self.__connection.projects.get(project.id))
+                projects.append(self.__connection.projects.get(project.id, statistics=statistics))
             self.__logger.info(f"Gitlab group {group_name} projects info successfully collected")
             return projects
         self.__logger.info(f"Gitlab project {group_name}/{project_name} info successfully collected")
-        return [self.__connection.projects.get(f'{group_name}/{project_name}')]
+        return [self.__connection.projects.get(f'{group_name}/{project_name}', statistics=statistics)]
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
@@ -0,0 +1,199 @@
+from mr_records import ProjectRecord
+
+DEFAULT_GRAPHQL_PAGE_SIZE = 20
+DISCUSSIONS_PAGE_SIZE = 100
+NOTES_PAGE_SIZE = 100
+LABELS_PAGE_SIZE = 100
+
+_NOTES_FIELDS = '''
+    id
+    notes(first: %(notes_first)d) {
+      pageInfo { hasNextPage }
+      nodes {
+        id body system createdAt
+        author { name username }
+        position { newLine oldLine newPath oldPath }
+      }
+    }
+'''
+
+MERGE_REQUESTS_QUERY = '''
+query($fullPath: ID!, $first: Int!, $after: String, $updatedAfter: Time) {
+  project(fullPath: $fullPath) {
+    mergeRequests(state: opened, sort: CREATED_ASC, first: $first, after: $after, updatedAfter: $updatedAfter) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        iid title description sourceBranch targetBranch createdAt
+        author { name username }
+        labels(first: %(labels_first)d) { nodes { title } }
+        discussions(first: %(discussions_first)d) {
+          pageInfo { hasNextPage endCursor }
+          nodes { %(notes_fields)s }
+        }
+      }
+    }
+  }
+}
+''' % {'labels_first': LABELS_PAGE_SIZE, 'discussions_first': DISCUSSIONS_PAGE_SIZE,
+       'notes_fields': _NOTES_FIELDS % {'notes_first': NOTES_PAGE_SIZE}}
+
+DISCUSSIONS_QUERY = '''
+query($fullPath: ID!, $iid: String!, $first: Int!, $after: String) {
+  project(fullPath: $fullPath) {
+    mergeRequest(iid: $iid) {
+      discussions(first: $first, after: $after) {
+        pageInfo { hasNextPage endCursor }
+        nodes { %(notes_fields)s }
+      }
+    }
+  }
+}
+''' % {'notes_fields': _NOTES_FIELDS % {'notes_first': NOTES_PAGE_SIZE}}
+
+LABELS_QUERY = '''
+query($fullPath: ID!, $first: Int!, $after: String) {
+  project(fullPath: $fullPath) {
+    labels(first: $first, after: $after, includeAncestorGroups: true) {
+      pageInfo { hasNextPage endCursor }
+      nodes { title color description }
+    }
+  }
+}
+'''
+
+
+def get_gid_number(gid: str) -> int:
+    """
+    Returns REST API id from GraphQL global id ("gid://gitlab/Note/123" -> 123)
+    """
+    return int(gid.rsplit('/', 1)[-1])
+
+
+class GitlabGraphqlClient:
+    def __init__(self, api_url: str, token: str, logger, ssl_verify: bool = True,
+                 page_size: int = DEFAULT_GRAPHQL_PAGE_SIZE):
+        """
+        Reads MRs with their discussions and labels through Gitlab GraphQL API:
+        a page of MRs comes with their discussions, notes and labels in one request
+        :param api_url: base gitlab url (w/o api/v4)
+        :param token: gitlab user's access token
+        :param ssl_verify: if SSL cert needs to be verified
+        :param page_size: MRs per request
+        """
+        self.__graphql_url = f'{api_url}api/graphql'
+        self.__token = token
+        self.__logger = logger
+        self.__ssl_verify = ssl_verify
+        self.__page_size = page_size
+        self.__session = None
+
+    def __query(self, query: str, variables: dict) -> dict:
+        """
+        Runs GraphQL query
+        :return: response data
+        """
+        import requests
+        if self.__session is None:
+            self.__session = requests.Session()
+            self.__session.headers['Authorization'] = f'Bearer {self.__token}'
+        response = self.__session.post(self.__graphql_url, json={'query': query, 'variables': variables},
+                                       verify=self.__ssl_verify)
+        response.raise_for_status()
+        response_data = response.json()
+        if response_data.get('errors'):
+            raise RuntimeError(f'Gitlab GraphQL query failed: {response_data["errors"]}')
+        return response_data['data']
+
+    def __iter_pages(self, query: str, variables: dict, get_connection, after: str = None):
+        """
+        Iterates over nodes of paginated connection
+        :param get_connection: callable returning connection from response data
+        :param after: cursor to start after, from the first node if None
+        """
+        while True:
+            connection = get_connection(self.__query(query, {**variables, 'after': after}))
+            yield from connection['nodes']
+            if not connection['pageInfo']['hasNextPage']:
+                return
+            after = connection['pageInfo']['endCursor']
+
+    def __convert_discussion(self, discussion: dict, mr_iid: int) -> dict:
+        """
+        Converts GraphQL discussion to REST API form used by RepositoryCloner
+        """
+        if discussion['notes']['pageInfo']['hasNextPage']:
+            self.__logger.warning(f'Discussion {discussion["id"]} of MR !{mr_iid} has more than '
+                                  f'{NOTES_PAGE_SIZE} notes, the rest are not copied')
+        notes = []
+        for note in discussion['notes']['nodes']:
+            position = note['position']
+            notes.append({
+                'id': get_gid_number(note['id']),
+                'body': note['body'],
+                'system': note['system'],
+                'created_at': note['createdAt'],
+                'author': note['author'],
+                'type': 'DiffNote' if position is not None else None,
+                'position': None if position is None else {
+                    'new_line': position['newLine'],
+                    'old_line': position['oldLine'],
+                    'new_path': position['newPath'],
+                    'old_path': position['oldPath']
+                }
+            })
+        return {'id': discussion['id'], 'notes': notes}
+
+    def iter_merge_requests(self, project_full_path: str, updated_after: str = None):
+        """
+        Iterates over open MRs of project (oldest first) in REST API form with "discussions" attribute
+        :param project_full_path: Gitlab project full path (group/project)
+        :param updated_after: ISO time, only MRs updated after it are read, all MRs if None
+        :return: generator of MR attributes dicts
+        """
+        for gl_mr in self.__iter_pages(MERGE_REQUESTS_QUERY, {'fullPath': project_full_path,
+                                                              'first': self.__page_size,
+                                                              'updatedAfter': updated_after},
+                                       lambda data: data['project']['mergeRequests']):
+            mr_iid = int(gl_mr['iid'])
+            discussions = gl_mr['discussions']['nodes']
+            if gl_mr['discussions']['pageInfo']['hasNextPage']:
+                # the rest of discussions of long MR are read separately
+                discussions = list(discussions)
+                discussions.extend(self.__iter_pages(
+                    DISCUSSIONS_QUERY, {'fullPath': project_full_path, 'iid': gl_mr['iid'],
+                                        'first': DISCUSSIONS_PAGE_SIZE},
+                    lambda data: data['project']['mergeRequest']['discussions'],
+                    gl_mr['discussions']['pageInfo']['endCursor']
+                ))
+            yield {
+                'iid': mr_iid,
+                'title': gl_mr['title'],
+                'description': gl_mr['description'] or '',
+                'source_branch': gl_mr['sourceBranch'],
+                'target_branch': gl_mr['targetBranch'],
+                'created_at': gl_mr['createdAt'],
+                'author': gl_mr['author'],
+                'labels': [label['title'] for label in gl_mr['labels']['nodes']],
+                'discussions': [self.__convert_discussion(discussion, mr_iid) for discussion in discussions]
+            }
+
+    def iter_labels(self, project_full_path: str):
+        """
+        Iterates over project's labels (including ancestor groups' labels) in REST API form
+        :param project_full_path: Gitlab project full path (group/project)
+        :return: generator of label attributes dicts
+        """
+        for label in self.__iter_pages(LABELS_QUERY, {'fullPath': project_full_path, 'first': LABELS_PAGE_SIZE},
+                                       lambda data: data['project']['labels']):
+            yield {'name': label['title'], 'color': label['color'], 'description': label['description']}
+
+    def get_project(self, gl_project, project_full_path: str) -> ProjectRecord:
+        """
+        Returns stand-in for Gitlab project whose MRs and labels are read through GraphQL lazily
+        :param gl_project: Gitlab project (its attributes are kept)
+        :param project_full_path: Gitlab project full path (group/project)
+        """
+        return ProjectRecord(dict(getattr(gl_project, 'attributes', {})),
+                             lambda: self.iter_labels(project_full_path),
+                             lambda updated_after=None: self.iter_merge_requests(project_full_path, updated_after),
+                             ('updated_after',))
@@ -0,0 +1,302 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import shutil
+import tarfile
+import threading
+import time
+
+from mr_records import ProjectRecord
+
+EXPORT_FILE_SUFFIX = '.tar.gz'
+EXPORT_POLL_INTERVAL = 5
+EXPORT_TIMEOUT = 3600
+BUNDLE_MEMBER = 'project.bundle'
+MERGE_REQUESTS_MEMBER = 'tree/project/merge_requests.ndjson'
+LABELS_MEMBER = 'tree/project/labels.ndjson'
+MEMBERS_MEMBER = 'tree/project/project_members.ndjson'
+EXPORT_MEMBERS = (BUNDLE_MEMBER, MERGE_REQUESTS_MEMBER, LABELS_MEMBER, MEMBERS_MEMBER)
+
+
+def iter_ndjson(file_path: str):
+    """
+    Reads NDJSON file line by line
+    :param file_path: file path, nothing is read if file doesn't exist
+    :return: generator of dicts
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, 'r', encoding='utf-8') as ndjson_file:
+        for line in ndjson_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_time(value: str) -> datetime:
+    """
+    Parses ISO time of export ("2020-01-01T10:00:00.000Z") or of MRs list param
+    """
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class GitlabExportArchive:
+    def __init__(self, work_path: str):
+        """
+        Gitlab project export (NDJSON format, Gitlab 13+) unpacked to work folder.
+        Open MRs with discussions and labels are read from its NDJSON files lazily line by line
+        and converted to REST API form, so RepositoryCloner replays them as MRs read from API
+        :param work_path: folder with unpacked export
+        """
+        self.__work_path = work_path
+        self.__users_names = None
+
+    @property
+    def bundle_path(self):
+        return os.path.join(self.__work_path, BUNDLE_MEMBER)
+
+    def unpack(self, export_file_path: str):
+        """
+        Unpacks repo bundle and MRs, labels and members NDJSON files from export tarball in one streaming pass,
+        the rest of export (uploads, CI, wiki, ...) is skipped
+        :param export_file_path: export tarball path
+        """
+        shutil.rmtree(self.__work_path, ignore_errors=True)
+        with tarfile.open(export_file_path, 'r|gz') as export_file:
+            for member in export_file:
+                member_name = os.path.normpath(member.name)
+                if member_name not in EXPORT_MEMBERS or not member.isfile():
+                    continue
+                member_path = os.path.join(self.__work_path, member_name)
+                os.makedirs(os.path.dirname(member_path), exist_ok=True)
+                with open(member_path, 'wb') as member_file:
+                    shutil.copyfileobj(export_file.extractfile(member), member_file)
+
+    def __get_user_name(self, user_id) -> str:
+        """
+        Returns name of project member for MR author, export has only authors ids for MRs
+        """
+        if self.__users_names is None:
+            self.__users_names = {member['user_id']: member['user'].get('username')
+                                  for member in iter_ndjson(os.path.join(self.__work_path, MEMBERS_MEMBER))
+                                  if member.get('user')}
+        return self.__users_names.get(user_id) or f'Gitlab user {user_id}'
+
+    @staticmethod
+    def __get_note_attributes(note: dict) -> dict:
+        position = note.get('position')
+        return {
+            'id': note['id'],
+            'body': note['note'] or '',
+            'system': note.get('system', False),
+            'created_at': note['created_at'],
+            'author': note.get('author') or {'name': f'Gitlab user {note.get("author_id")}'},
+            'type': note.get('type') if position else None,
+            'position': position
+        }
+
+    def __get_merge_request_attributes(self, mr_data: dict) -> dict:
+        """
+        Converts exported MR to REST API form with "discussions" attribute,
+        notes are grouped to discussions in creation order
+        """
+        discussions = {}
+        for note in sorted(mr_data.get('notes', []), key=lambda note: note['created_at']):
+            discussion_id = note.get('discussion_id') or f'note-{note["id"]}'
+            discussions.setdefault(discussion_id, []).append(self.__get_note_attributes(note))
+        return {
+            'iid': mr_data['iid'],
+            'title': mr_data['title'],
+            'description': mr_data.get('description') or '',
+            'source_branch': mr_data['source_branch'],
+            'target_branch': mr_data['target_branch'],
+            'created_at': mr_data['created_at'],
+            'author': {'name': self.__get_user_name(mr_data.get('author_id'))},
+            'labels': [label_link['label']['title'] for label_link in mr_data.get('label_links', [])
+                       if label_link.get('label')],
+            'discussions': [{'id': discussion_id, 'notes': notes} for discussion_id, notes in discussions.items()]
+        }
+
+    def iter_merge_requests(self, updated_after: str = None):
+        """
+        Iterates over open MRs in REST API form, only one MR is kept in memory at a time
+        :param updated_after: ISO time, only MRs updated after it are converted, all MRs if None
+        """
+        updated_after_time = None if updated_after is None else parse_time(updated_after)
+        for mr_data in iter_ndjson(os.path.join(self.__work_path, MERGE_REQUESTS_MEMBER)):
+            if mr_data.get('state') != 'opened':
+                continue
+            if updated_after_time is not None and mr_data.get('updated_at') and \
+                    parse_time(mr_data['updated_at']) <= updated_after_time:
+                continue
+            yield self.__get_merge_request_attributes(mr_data)
+
+    def iter_labels(self):
+        """
+        Iterates over project labels and group labels used by MRs in REST API form.
+        Group labels aren't in project labels file, they are gathered from MRs labels links
+        """
+        labels = {}
+        for label in iter_ndjson(os.path.join(self.__work_path, LABELS_MEMBER)):
+            labels.setdefault(label['title'], label)
+        for mr_data in iter_ndjson(os.path.join(self.__work_path, MERGE_REQUESTS_MEMBER)):
+            for label_link in mr_data.get('label_links', []):
+                if label_link.get('label'):
+                    labels.setdefault(label_link['label']['title'], label_link['label'])
+        for label in labels.values():
+            yield {'name': label['title'], 'color': label.get('color'), 'description': label.get('description')}
+
+    def get_project(self) -> ProjectRecord:
+        """
+        Returns stand-in for Gitlab project whose MRs and labels are read from export
+        """
+        return ProjectRecord({}, self.iter_labels, self.iter_merge_requests, ('updated_after',))
+
+
+class GitlabProjectExporter:
+    def __init__(self, logger, exports_path: str, work_path: str, workers: int,
+                 poll_interval: int = EXPORT_POLL_INTERVAL, timeout: int = EXPORT_TIMEOUT):
+        """
+        Gets Gitlab project exports (repo bundle, MRs with notes and labels as NDJSON in single tarball)
+        instead of reading every MR and discussion through API. Exports of several projects are made and downloaded
+        in background while earlier projects are migrated.
+        Export prepared in advance as <exports_path>/<group>/<project>.tar.gz (f.e. by Gitlab admin) is used as is
+        and kept, otherwise export is triggered, downloaded there and deleted after project is migrated.
+        At most "workers" exports are made or kept ahead of migration, next export is started when project
+        whose export was used is migrated, so tarballs don't pile up on local disk
+        :param exports_path: folder for export tarballs
+        :param work_path: folder for unpacked exports
+        :param workers: number of exports made in parallel and kept ahead of migration
+        :param poll_interval: seconds between export status checks
+        :param timeout: max seconds to wait for export
+        """
+        self.__logger = logger
+        self.__exports_path = exports_path
+        self.__work_path = work_path
+        self.__poll_interval = poll_interval
+        self.__timeout = timeout
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gitlab-export')
+        self.__max_ahead = workers
+        self.__exports = {}
+        self.__pending = []
+        self.__ahead = 0
+        self.__lock = threading.Lock()
+
+    def __get_export_file_path(self, repo_full_name: str) -> str:
+        return f'{self.__exports_path}{repo_full_name}{EXPORT_FILE_SUFFIX}'
+
+    def get_bundle_path(self, repo_full_name: str) -> str:
+        return GitlabExportArchive(f'{self.__work_path}{repo_full_name}').bundle_path
+
+    def get_projected_disk_use(self, repo_full_name: str, repository_size: int) -> int:
+        """
+        Returns local disk used by project export while repo is migrated: downloaded tarball and unpacked bundle,
+        both are about repository size (prepared export is already on disk, only its unpacked bundle is counted)
+        :param repo_full_name: repo full name (group/project)
+        :param repository_size: Gitlab repository size in bytes
+        :return: projected disk use in bytes
+        """
+        export_file_path = self.__get_export_file_path(repo_full_name)
+        if os.path.exists(export_file_path):
+            return os.path.getsize(export_file_path)
+        return 2 * repository_size
+
+    def __export(self, repo_full_name: str, gl_project) -> tuple:
+        """
+        Makes and downloads project export
+        :return: tuple (export tarball path, was export prepared in advance)
+        """
+        export_file_path = self.__get_export_file_path(repo_full_name)
+        if os.path.exists(export_file_path):
+            self.__logger.info(f'Using prepared export of [{repo_full_name}]: {export_file_path}')
+            return export_file_path, True
+        self.__logger.info(f'Exporting Gitlab project [{repo_full_name}]...')
+        export_start = time.monotonic()
+        gl_project.exports.create()
+        gl_export = gl_project.exports.get()
+        while gl_export.export_status != 'finished':
+            if gl_export.export_status == 'failed':
+                raise RuntimeError(f'Export of Gitlab project [{repo_full_name}] failed')
+            if time.monotonic() - export_start > self.__timeout:
+                raise TimeoutError(f'Export of Gitlab project [{repo_full_name}] is not finished '
+                                   f'in {self.__timeout} s, status "{gl_export.export_status}"')
+            time.sleep(self.__poll_interval)
+            gl_export.refresh()
+        os.makedirs(os.path.dirname(export_file_path), exist_ok=True)
+        with open(f'{export_file_path}.tmp', 'wb') as export_file:
+            gl_export.download(streamed=True, action=export_file.write)
+        os.replace(f'{export_file_path}.tmp', export_file_path)
+        self.__logger.info(f'Gitlab project [{repo_full_name}] exported in {time.monotonic() - export_start:.1f} s: '
+                           f'{os.path.getsize(export_file_path)} bytes')
+        return export_file_path, False
+
+    def __submit(self, repo_full_name: str, gl_project):
+        self.__exports[repo_full_name] = self.__executor.submit(self.__export, repo_full_name, gl_project)
+        self.__ahead += 1
+
+    def __submit_pending(self, repo_full_name: str = None):
+        """
+        Starts pending exports while there are free slots, export of repo_full_name is started even without free slot
+        (its repo is migrated already)
+        """
+        with self.__lock:
+            for pending_export in list(self.__pending):
+                if pending_export[0] == repo_full_name or self.__ahead < self.__max_ahead:
+                    self.__pending.remove(pending_export)
+                    self.__submit(*pending_export)
+
+    def __release(self):
+        with self.__lock:
+            self.__ahead -= 1
+        self.__submit_pending()
+
+    def start(self, repo_full_name: str, gl_project):
+        """
+        Queues project export, exports are made in order they are queued, at most "workers" ahead of migration
+        :param repo_full_name: repo full name (group/project)
+        :param gl_project: Gitlab project
+        """
+        with self.__lock:
+            self.__pending.append((repo_full_name, gl_project))
+        self.__submit_pending()
+
+    @contextmanager
+    def exported_project(self, repo_full_name: str, repo_cloner):
+        """
+        Waits for project export and unpacks it while repo is migrated: repo is cloned from export's bundle
+        (cloner's source url has to be get_bundle_path()), MRs with discussions and labels are read from export.
+        If export failed, repo is cloned from Gitlab and MRs are read through API
+        :param repo_full_name: repo full name (group/project)
+        :param repo_cloner: repo's cloner
+        :return: unpacked export or None if export failed
+        """
+        self.__submit_pending(repo_full_name)
+        export_archive = GitlabExportArchive(f'{self.__work_path}{repo_full_name}')
+        downloaded_file_path = None
+        try:
+            try:
+                export_file_path, is_prepared = self.__exports[repo_full_name].result()
+                downloaded_file_path = None if is_prepared else export_file_path
+                export_archive.unpack(export_file_path)
+            except Exception as err:
+                self.__logger.error(f'Export of Gitlab project [{repo_full_name}] is not used, repo is cloned '
+                                    f'from Gitlab and MRs are read through API: {err}')
+                repo_cloner.set_source_repo_url(None)
+                export_archive = None
+            else:
+                repo_cloner.set_merge_requests_source(export_archive.get_project())
+            yield export_archive
+        finally:
+            shutil.rmtree(f'{self.__work_path}{repo_full_name}', ignore_errors=True)
+            if downloaded_file_path is not None and os.path.exists(downloaded_file_path):
+                os.remove(downloaded_file_path)
+            self.__release()
+
+    def close(self):
+        """
+        Cancels exports which weren't started
+        """
+        with self.__lock:
+            self.__pending.clear()
+        self.__executor.shutdown(wait=True, cancel_futures=True)
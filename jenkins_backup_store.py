@@ -0,0 +1,125 @@
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import zipfile
+
+INDEX_FILE_NAME = 'index.json'
+ARCHIVE_NAME_PATTERN = 'jobs-{run_id}.zip'
+
+
+class JenkinsBackupStore:
+    def __init__(self, backup_path: str, logger, run_id: str = None):
+        """
+        Deduplicated store for Jenkins jobs configs.
+        All configs backed up during one run are written to one compressed archive,
+        configs already stored by previous runs (same content hash) are not written again.
+        Index file maps content hashes to archives and keeps job name -> hash and sequence number for every run.
+        Archive and index are written on every backup, so configs are restorable even if the run is killed
+        right after Jenkins jobs were changed.
+        :param backup_path: folder for archives and index
+        :param run_id: run identifier, current timestamp if not set
+        """
+        self.__logger = logger
+        self.__backup_path = backup_path
+        self.__run_id = run_id if run_id else datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.__archive_name = ARCHIVE_NAME_PATTERN.format(run_id=self.__run_id)
+        self.__lock = threading.Lock()
+        os.makedirs(self.__backup_path, exist_ok=True)
+        self.__index = self.__load_index()
+        self.__run_jobs = self.__index["runs"].setdefault(self.__run_id, {})
+        # runs are ordered by sequence number, run ids don't have to sort chronologically
+        runs_sequence = self.__index.setdefault("runs_sequence", {})
+        if self.__run_id not in runs_sequence:
+            runs_sequence[self.__run_id] = max(runs_sequence.values(), default=0) + 1
+
+    def __enter__(self):
+        return self
+
+    @property
+    def run_id(self):
+        return self.__run_id
+
+    @property
+    def __index_path(self):
+        return os.path.join(self.__backup_path, INDEX_FILE_NAME)
+
+    def __load_index(self) -> dict:
+        """
+        Loads index from backup folder
+        :return: index dict with "blobs" (hash -> archive name), "runs" (run id -> {job name: hash})
+                 and "runs_sequence" (run id -> sequence number)
+        """
+        if not os.path.exists(self.__index_path):
+            return {"blobs": {}, "runs": {}}
+        with open(self.__index_path, 'r') as index_file:
+            return json.load(index_file)
+
+    def __save_index(self):
+        """
+        Writes index atomically (via temporary file), so interrupted run doesn't break previous backups
+        """
+        tmp_index_path = f'{self.__index_path}.tmp'
+        with open(tmp_index_path, 'w') as index_file:
+            json.dump(self.__index, index_file, indent=1, sort_keys=True)
+        os.replace(tmp_index_path, self.__index_path)
+
+    def backup(self, job_name: str, job_config: str) -> str:
+        """
+        Backs up job config. Config is written to the run's archive only if it wasn't stored before
+        :param job_name: job full name (with folders)
+        :param job_config: job XML config
+        :return: config content hash
+        """
+        data = job_config.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        with self.__lock:
+            if digest not in self.__index["blobs"]:
+                # archive is closed after every config, so its central directory is always written
+                archive_path = os.path.join(self.__backup_path, self.__archive_name)
+                with zipfile.ZipFile(archive_path, 'a', compression=zipfile.ZIP_LZMA) as archive:
+                    archive.writestr(digest, data)
+                self.__index["blobs"][digest] = self.__archive_name
+            else:
+                self.__logger.debug(f'-- Config of job {job_name} is unchanged, already stored')
+            self.__run_jobs[job_name] = digest
+            self.__save_index()
+        return digest
+
+    def restore(self, job_name: str, run_id: str = None) -> str:
+        """
+        Returns backed up job config
+        :param job_name: job full name (with folders)
+        :param run_id: run to restore from, latest run with that job if not set
+        :return: job XML config or None if job wasn't backed up
+        """
+        if run_id is not None:
+            digest = self.__index["runs"].get(run_id, {}).get(job_name)
+        else:
+            digest = None
+            runs_sequence = self.__index.get("runs_sequence", {})
+            # runs of index written before sequence numbers were kept are older, they are ordered by run id
+            for saved_run_id in sorted(self.__index["runs"], key=lambda saved_run_id: (
+                    runs_sequence.get(saved_run_id, 0), saved_run_id), reverse=True):
+                digest = self.__index["runs"][saved_run_id].get(job_name)
+                if digest is not None:
+                    break
+        if digest is None:
+            return None
+        archive_name = self.__index["blobs"][digest]
+        with self.__lock, zipfile.ZipFile(os.path.join(self.__backup_path, archive_name), 'r') as archive:
+            return archive.read(digest).decode()
+
+    def close(self):
+        """
+        Saves index, run without backed up jobs is removed from it
+        """
+        with self.__lock:
+            if not self.__run_jobs:
+                self.__index["runs"].pop(self.__run_id, None)
+                self.__index["runs_sequence"].pop(self.__run_id, None)
+            self.__save_index()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
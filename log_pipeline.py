@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import json
+import logging
+import copy
+import os
+import queue
+import time
+
+MAX_OPEN_REPO_LOG_FILES = 64
+DEFAULT_OUTPUT_BURST = 20
+DEFAULT_OUTPUT_INTERVAL = 1.0
+
+_log_repo = ContextVar('log_repo', default=None)
+_log_step = ContextVar('log_step', default=None)
+
+
+@contextmanager
+def log_context(repo: str = None, step: str = None):
+    """
+    Tags log records made inside the block (in current thread or task) with repo and/or step
+    :param repo: repo full name
+    :param step: migration step name
+    """
+    tokens = []
+    if repo is not None:
+        tokens.append((_log_repo, _log_repo.set(repo)))
+    if step is not None:
+        tokens.append((_log_step, _log_step.set(step)))
+    try:
+        yield
+    finally:
+        for context_var, token in reversed(tokens):
+            context_var.reset(token)
+
+
+class LogContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Adds repo and step of current log context to record. Record which already has them isn't changed,
+        so context is taken in the thread which made the record, not in the queue writer thread
+        """
+        if not hasattr(record, 'repo'):
+            record.repo = _log_repo.get()
+            record.step = _log_step.get()
+        if not hasattr(record, 'log_context'):
+            context_parts = [part for part in (record.repo, record.step) if part]
+            record.log_context = f'[{" ".join(context_parts)}] ' if context_parts else ''
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Formats record as single line JSON object
+        """
+        record_data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'repo': getattr(record, 'repo', None),
+            'step': getattr(record, 'step', None),
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            record_data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # record prepared by RecordQueueHandler has exception already formatted
+            record_data['exception'] = record.exc_text
+        return json.dumps(record_data, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Makes record picklable and independent of its thread: message is merged with args and exception
+        is formatted to exc_text, but unlike QueueHandler.prepare exception isn't folded into message,
+        so JSON records keep it in separate field and text formatters still append it
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RepoFileHandler(logging.Handler):
+    def __init__(self, logs_path: str, level=logging.NOTSET):
+        """
+        Writes records tagged with repo to separate file per repo: <logs_path>/<group>/<project>.log.
+        Only recently used files are kept open
+        :param logs_path: folder for repo log files
+        """
+        super().__init__(level)
+        self.__logs_path = logs_path
+        self.__streams = OrderedDict()
+
+    def __get_stream(self, repo: str):
+        stream = self.__streams.pop(repo, None)
+        if stream is None:
+            log_file_path = os.path.join(self.__logs_path, f'{repo}.log')
+            os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
+            stream = open(log_file_path, 'a', encoding='utf-8')
+            if len(self.__streams) >= MAX_OPEN_REPO_LOG_FILES:
+                _, oldest_stream = self.__streams.popitem(last=False)
+                oldest_stream.close()
+        self.__streams[repo] = stream
+        return stream
+
+    def emit(self, record: logging.LogRecord):
+        repo = getattr(record, 'repo', None)
+        if repo is None:
+            return
+        try:
+            stream = self.__get_stream(repo)
+            stream.write(f'{self.format(record)}\n')
+            stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            for stream in self.__streams.values():
+                stream.close()
+            self.__streams.clear()
+        finally:
+            self.release()
+        super().close()
+
+
+class RateLimitedOutputLog:
+    def __init__(self, logger, level: int = logging.DEBUG, burst: int = DEFAULT_OUTPUT_BURST,
+                 interval: float = DEFAULT_OUTPUT_INTERVAL):
+        """
+        Logs bulk command output line by line without flooding the log: first "burst" lines are logged,
+        then at most one line per "interval" seconds, other lines are only counted
+        :param level: log level for output lines
+        :param burst: number of lines logged without limit
+        :param interval: min seconds between logged lines after burst
+        """
+        self.__logger = logger
+        self.__level = level
+        self.__burst = burst
+        self.__interval = interval
+        self.__logged_count = 0
+        self.__suppressed_count = 0
+        self.__last_logged_time = 0.0
+
+    def log(self, line: str):
+        if not self.__logger.isEnabledFor(self.__level):
+            return
+        now = time.monotonic()
+        if self.__logged_count < self.__burst or now - self.__last_logged_time >= self.__interval:
+            if self.__suppressed_count:
+                line = f'{line} ({self.__suppressed_count} lines skipped)'
+                self.__suppressed_count = 0
+            self.__logger.log(self.__level, line)
+            self.__logged_count += 1
+            self.__last_logged_time = now
+        else:
+            self.__suppressed_count += 1
+
+    def flush(self, last_line: str = None):
+        """
+        Logs last output line (usually the final progress state) if it was skipped
+        :param last_line: last output line
+        """
+        if self.__suppressed_count and last_line is not None:
+            self.__logger.log(self.__level, f'{last_line} ({self.__suppressed_count - 1} lines skipped)')
+        self.__suppressed_count = 0
+
+
+def start_queue_logging(logger, repo_logs_path: str = None) -> QueueListener:
+    """
+    Moves logger's handlers behind a queue: records are only put to queue by the threads which make them,
+    formatting and I/O are made by single background writer thread
+    :param logger: logger which handlers are moved
+    :param repo_logs_path: folder for per-repo JSON log files, no per-repo files if None
+    :return: started listener, it has to be stopped at exit to write the rest of records
+    """
+    handlers = list(logger.handlers)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    if repo_logs_path:
+        repo_file_handler = RepoFileHandler(repo_logs_path)
+        repo_file_handler.setFormatter(JsonFormatter())
+        handlers.append(repo_file_handler)
+    records_queue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(records_queue)
+    queue_handler.addFilter(LogContextFilter())
+    logger.addHandler(queue_handler)
+    listener = QueueListener(records_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,14 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import argparse
+import json
 import logging
 import logging.config
-from sys import argv, exit
+from sys import exit
 import os
 
-from urllib3 import disable_warnings
 import yaml
 
-from config_loader import MigrationConfig
+from bitbucket_provisioner import BitbucketProvisioner
+from clone_scheduler import CloneJob, CloneScheduler
+from config_loader import MigrationConfig, RepoConfig
+from cutover import CutoverRunner, RepoCutover
+from delta_sync import DeltaSync, get_sync_targets
+from git_commands import set_ssh_multiplexer
 from gitlab_connection import GitlabConnection
+from gitlab_project_export import GitlabProjectExporter
+from jenkins_backup_store import JenkinsBackupStore
+from log_pipeline import log_context, start_queue_logging
+from mr_records import ProjectRecord
+from multi_target_cloner import MultiTargetCloner, make_repo_cloner
+from project_archive import ProjectArchive, ProjectExporter, find_archives
 from repository_cloner import RepositoryCloner
+from run_profiler import PROFILE_MODES, RunProfiler
+from ssh_multiplexer import SshMultiplexer
+from step_executor import StepGraphExecutor
+from step_plugins import ClientRegistry, GITLAB_ONLY_STEPS, STEP_PLUGINS, WARM_ONLY_STEPS, get_enabled_step_plugins
+
+
+# steps made by cutover phase of two-phase migration, warm phase doesn't make them
+CUTOVER_STEPS = frozenset({'archive', 'jenkins'})
 
 
 def get_logger_and_prepare_run_environment(is_gitlab_migrate_works_in_docker: bool):
@@ -62,41 +84,432 @@ def get_logger_and_prepare_run_environment(is_gitlab_migrate_works_in_docker: bo
     return logger
 
 
+def migrate_repo(repo: RepoConfig, repo_cloner, step_executor: StepGraphExecutor, logger,
+                 done_steps: set = frozenset()) -> bool:
+    """
+    Runs migration steps turned on for single repo, independent steps run concurrently
+    :param repo: repo config
+    :param repo_cloner: repo's cloner (RepositoryCloner or MultiTargetCloner)
+    :param step_executor: steps dependency graph executor
+    :param logger: logger object
+    :param done_steps: names of steps which were already made (f.e. by BitBucket provisioning)
+    :return: was local repo clone deleted
+    """
+    logger.info(f'=== Starting work with repo [{repo_cloner.repo_full_name}] ===')
+    plugins = [plugin for plugin in get_enabled_step_plugins(repo) if plugin.name not in done_steps]
+    with repo_cloner:
+        step_results = step_executor.run(plugins, STEP_PLUGINS, repo_cloner)
+    logger.info(f'=== Finished work with repo [{repo_cloner.repo_full_name}] ===')
+    return bool(step_results.get('clear'))
+
+
+def run_migration(migration_properties: MigrationConfig, repos: list, clients: ClientRegistry, logger,
+                  skipped_steps: set = frozenset(), repo_contexts: dict = None, profiler: RunProfiler = None,
+                  extra_disk_use: dict = None, repos_skipped_steps: dict = None):
+    """
+    Provisions BitBucket repos of the wave and runs migration steps for every repo.
+    Repos are migrated largest-first, iRepoWorkers at a time while their clones fit local disk budget
+    :param migration_properties: migration config
+    :param repos: list of tuples (repo config, repo's cloner)
+    :param clients: run's shared clients
+    :param logger: logger object
+    :param skipped_steps: names of steps which are not run for any repo
+    :param repo_contexts: {repo full name: callable returning context manager entered while repo is migrated}
+    :param profiler: profiler of selected steps and repos
+    :param extra_disk_use: {repo full name: local disk used besides repo clone in bytes (f.e. by project export)}
+    :param repos_skipped_steps: {repo full name: names of steps which are not run for repo}
+    """
+    step_executor = StepGraphExecutor(logger, migration_properties.step_workers, profiler)
+    bitbucket_provisioner = BitbucketProvisioner(logger, migration_properties.provision_workers)
+    provisioned_steps = bitbucket_provisioner.provision(repos)
+    repo_contexts = repo_contexts or {}
+    extra_disk_use = extra_disk_use or {}
+    repos_skipped_steps = repos_skipped_steps or {}
+
+    def run_job(repo: RepoConfig, repo_cloner) -> bool:
+        repo_context = repo_contexts.get(repo_cloner.repo_full_name, nullcontext)
+        targets_steps = [provisioned_steps[target_cloner.bitbucket_target_name]
+                         for _, target_cloner in repo_cloner.targets]
+        if isinstance(repo_cloner, MultiTargetCloner):
+            # steps made for some targets only are made for the rest by cloner
+            repo_cloner.set_done_steps({target_cloner.bitbucket_target_name: steps
+                                        for (_, target_cloner), steps in zip(repo_cloner.targets, targets_steps)})
+        with log_context(repo=repo_cloner.repo_full_name), repo_context():
+            return migrate_repo(repo, repo_cloner, step_executor, logger,
+                                set.intersection(*targets_steps) | skipped_steps |
+                                repos_skipped_steps.get(repo_cloner.repo_full_name, frozenset()))
+
+    clone_jobs = []
+    for repo, repo_cloner in repos:
+        size = repo_cloner.repository_size if repo.will_gitlab_repo_be_cloned else 0
+        size += extra_disk_use.get(repo_cloner.repo_full_name, 0)
+        clone_jobs.append(CloneJob(repo_cloner.repo_full_name, size,
+                                   lambda repo_config=repo, cloner=repo_cloner: run_job(repo_config, cloner)))
+    clone_scheduler = CloneScheduler(logger, migration_properties.repo_workers, migration_properties.tmp_folder_budget)
+    clone_scheduler.run(clone_jobs)
+
+
+def migrate_repos(migration_properties: MigrationConfig, logger, ssl_verify: bool,
+                  jenkins_backup_store: JenkinsBackupStore = None, profiler: RunProfiler = None,
+                  skipped_steps: set = WARM_ONLY_STEPS):
+    """
+    Runs all migration steps for every repo in config
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    :param jenkins_backup_store: run's store for Jenkins jobs configs backups
+    :param profiler: profiler of selected steps and repos
+    :param skipped_steps: names of steps which are not run for any repo
+    """
+    clients = ClientRegistry(migration_properties.main_params, logger, ssl_verify)
+    repos = []
+    exported_repos = []
+    project_exporter = GitlabProjectExporter(logger, migration_properties.project_exports_path,
+                                             f'{migration_properties.tmp_folder}_gitlab_exports_work/',
+                                             migration_properties.export_workers)
+    with GitlabConnection(migration_properties.gitlab_api_base_url,
+                          migration_properties.gitlab_token, logger, ssl_verify) as gl_connection:
+        for repo in migration_properties.repos:
+            for gl_project in gl_connection.get_projects_from_group(repo.gitlab_group_name, repo.gitlab_project_name,
+                                                                    statistics=True):
+                source_repo_url = None
+                if repo.will_project_export_be_used:
+                    source_repo_url = project_exporter.get_bundle_path(f'{repo.gitlab_group_name}/{gl_project.path}')
+                repo_cloner = make_repo_cloner(repo, gl_project, logger, ssl_verify, jenkins_backup_store, clients,
+                                               source_repo_url=source_repo_url)
+                repos.append((repo, repo_cloner))
+                if repo.will_project_export_be_used:
+                    exported_repos.append((repo_cloner, gl_project))
+        # exports are made in the order repos are migrated (largest-first), so next repos' exports are ready
+        # while earlier repos are migrated
+        repo_contexts = {}
+        export_disk_use = {}
+        exported_repos.sort(key=lambda exported_repo: exported_repo[0].repository_size, reverse=True)
+        for repo_cloner, gl_project in exported_repos:
+            export_disk_use[repo_cloner.repo_full_name] = project_exporter.get_projected_disk_use(
+                repo_cloner.repo_full_name, repo_cloner.repository_size)
+            project_exporter.start(repo_cloner.repo_full_name, gl_project)
+            repo_contexts[repo_cloner.repo_full_name] = \
+                lambda cloner=repo_cloner: project_exporter.exported_project(cloner.repo_full_name, cloner)
+        try:
+            run_migration(migration_properties, repos, clients, logger, skipped_steps, repo_contexts, profiler,
+                          export_disk_use)
+        finally:
+            project_exporter.close()
+
+
+def export_repos(migration_properties: MigrationConfig, logger, ssl_verify: bool) -> bool:
+    """
+    Exports every repo in config to self-contained archive (git bundle, MRs, discussions and labels),
+    iExportWorkers repos in parallel
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    :return: were all repos exported
+    """
+    exporter = ProjectExporter(logger, migration_properties.export_path, migration_properties.tmp_folder,
+                               migration_properties.api_page_size)
+    with GitlabConnection(migration_properties.gitlab_api_base_url,
+                          migration_properties.gitlab_token, logger, ssl_verify) as gl_connection:
+        repo_cloners = []
+        for repo in migration_properties.repos:
+            for gl_project in gl_connection.get_projects_from_group(repo.gitlab_group_name, repo.gitlab_project_name):
+                repo_cloners.append((repo.gitlab_group_name, gl_project, RepositoryCloner(repo, gl_project, logger)))
+        with ThreadPoolExecutor(max_workers=migration_properties.export_workers) as executor:
+            archives = list(executor.map(lambda repo_data: exporter.export(repo_data[0], repo_data[1],
+                                                                           repo_data[2].gitlab_repo_url),
+                                         repo_cloners))
+    failed_count = len([archive_path for archive_path in archives if archive_path is None])
+    logger.info(f'=== Exported {len(archives) - failed_count} repos, {failed_count} failed ===')
+    return failed_count == 0
+
+
+def import_repos(migration_properties: MigrationConfig, logger, ssl_verify: bool,
+                 jenkins_backup_store: JenkinsBackupStore = None, profiler: RunProfiler = None):
+    """
+    Replays project archives made by "export" mode into BitBucket, Gitlab isn't connected.
+    Archives are matched with config repos by Gitlab group and project
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    :param jenkins_backup_store: run's store for Jenkins jobs configs backups
+    :param profiler: profiler of selected steps and repos
+    """
+    clients = ClientRegistry(migration_properties.main_params, logger, ssl_verify)
+    repos = []
+    repo_contexts = {}
+    repos_skipped_steps = {}
+    for repo in migration_properties.repos:
+        for archive_path in find_archives(migration_properties.export_path, repo.gitlab_group_name,
+                                          repo.gitlab_project_name):
+            project_archive = ProjectArchive(archive_path)
+            gl_project = project_archive.get_project()
+            bundle_path = f'{migration_properties.tmp_folder}_import/{repo.gitlab_group_name}/{gl_project.path}.bundle'
+            repo_cloner = make_repo_cloner(repo, gl_project, logger, ssl_verify, jenkins_backup_store, clients,
+                                           source_repo_url=bundle_path)
+            repos.append((repo, repo_cloner))
+            if project_archive.is_repo_empty:
+                # nothing to push, BitBucket repo is only created
+                logger.info(f'Repo [{repo_cloner.repo_full_name}] is empty, it will not be cloned')
+                repos_skipped_steps[repo_cloner.repo_full_name] = {'clone'}
+                continue
+            repo_contexts[repo_cloner.repo_full_name] = \
+                lambda archive=project_archive, path=bundle_path: extracted_bundle(archive, path)
+    logger.info(f'=== Importing {len(repos)} repos from {migration_properties.export_path} ===')
+    run_migration(migration_properties, repos, clients, logger, GITLAB_ONLY_STEPS | WARM_ONLY_STEPS, repo_contexts,
+                  profiler, repos_skipped_steps=repos_skipped_steps)
+
+
+@contextmanager
+def extracted_bundle(project_archive: ProjectArchive, bundle_path: str):
+    """
+    Extracts archive's git bundle while repo is imported
+    :param project_archive: project archive
+    :param bundle_path: path to extract bundle to
+    """
+    project_archive.extract_bundle(bundle_path)
+    try:
+        yield bundle_path
+    finally:
+        os.remove(bundle_path)
+
+
+def log_migration_plan(migration_properties: MigrationConfig, logger):
+    """
+    Logs steps and clients which will be used for every repo in config, nothing is connected
+    :param migration_properties: migration config
+    :param logger: logger object
+    """
+    for repo in migration_properties.repos:
+        plugins = [plugin for plugin in get_enabled_step_plugins(repo) if plugin.name not in WARM_ONLY_STEPS]
+        clients = sorted({client for plugin in plugins for client in plugin.clients})
+        gitlab_repo_name = f'{repo.gitlab_group_name}/{repo.gitlab_project_name or "*"}'
+        bitbucket_repos_names = ', '.join(f'{target.main_params["bitbucket_api_url"]} '
+                                          f'{target.bitbucket_project}/{target.bitbucket_repo_name_prefix}.*'
+                                          for target in repo.targets)
+        logger.info(f'[{gitlab_repo_name}] -> [{bitbucket_repos_names}]: '
+                    f'steps: {", ".join(plugin.name for plugin in plugins) or "-"}; '
+                    f'clients: {", ".join(["gitlab", *clients])}')
+
+
+def verify_repos(migration_properties: MigrationConfig, logger, ssl_verify: bool, report_file_path: str = None) -> bool:
+    """
+    Compares branches and tags of Gitlab and BitBucket repos for every repo (and its every BitBucket target)
+    in config, repos are checked in parallel
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    :param report_file_path: path to file for JSON report
+    :return: are all repos equal
+    """
+    clients = ClientRegistry(migration_properties.main_params, logger, ssl_verify)
+
+    def get_gl_projects(repo: RepoConfig) -> list:
+        # only project path is needed for ls-remote, so Gitlab API isn't called for project set in config
+        if repo.gitlab_project_name is not None:
+            return [ProjectRecord({'path': repo.gitlab_project_name}, lambda: [], lambda: [])]
+        return gl_connection.get_projects_from_group(repo.gitlab_group_name, details=False)
+
+    with GitlabConnection(migration_properties.gitlab_api_base_url,
+                          migration_properties.gitlab_token, logger, ssl_verify) as gl_connection, \
+            ThreadPoolExecutor(max_workers=migration_properties.verify_workers) as executor:
+        repo_cloners = []
+        for repo, gl_projects in zip(migration_properties.repos,
+                                     executor.map(get_gl_projects, migration_properties.repos)):
+            for gl_project in gl_projects:
+                repo_cloner = make_repo_cloner(repo, gl_project, logger, ssl_verify, clients=clients)
+                repo_cloners.extend(target_cloner for _, target_cloner in repo_cloner.targets)
+        reports = list(executor.map(lambda repo_cloner: repo_cloner.get_refs_report(), repo_cloners))
+    failed_reports = [report for report in reports if not report["ok"]]
+    logger.info(f'=== Verified {len(reports)} repos, {len(failed_reports)} differ ===')
+    if report_file_path:
+        with open(report_file_path, 'w') as report_file:
+            json.dump(reports, report_file, indent=2)
+    return len(failed_reports) == 0
+
+
+def warm_repos(migration_properties: MigrationConfig, logger, ssl_verify: bool,
+               jenkins_backup_store: JenkinsBackupStore = None, profiler: RunProfiler = None):
+    """
+    Warm phase of two-phase migration: runs migration steps while Gitlab repos stay writable
+    (no archiving, Jenkins jobs keep Gitlab urls), then prepares persistent mirrors and refs snapshots
+    of "sync" mode, so cutover transfers only refs changed since then
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    :param jenkins_backup_store: run's store for Jenkins jobs configs backups
+    :param profiler: profiler of selected steps and repos
+    """
+    # sync mirrors are made from local mirrors before they are deleted, so sync only fetches refs pushed meanwhile
+    migrate_repos(migration_properties, logger, ssl_verify, jenkins_backup_store, profiler, CUTOVER_STEPS)
+    sync_repos(migration_properties, logger, ssl_verify, once=True)
+
+
+def cutover_repos(migration_properties: MigrationConfig, logger, ssl_verify: bool,
+                  jenkins_backup_store: JenkinsBackupStore = None, report_file_path: str = None) -> bool:
+    """
+    Cutover phase of two-phase migration: archives Gitlab repos and transfers only refs, MRs and notes
+    changed since warm phase, freeze window of every repo is measured
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    :param jenkins_backup_store: run's store for Jenkins jobs configs backups
+    :param report_file_path: path to file for JSON report with freeze windows
+    :return: were all repos switched
+    """
+    repo_cutovers = []
+    clients = ClientRegistry(migration_properties.main_params, logger, ssl_verify)
+    with GitlabConnection(migration_properties.gitlab_api_base_url,
+                          migration_properties.gitlab_token, logger, ssl_verify) as gl_connection:
+        for repo in migration_properties.repos:
+            for gl_project in gl_connection.get_projects_from_group(repo.gitlab_group_name, repo.gitlab_project_name):
+                repo_cloner = make_repo_cloner(repo, gl_project, logger, ssl_verify, jenkins_backup_store, clients)
+                sync_targets = get_sync_targets(repo_cloner, migration_properties.sync_mirrors_path, logger)
+                repo_cutovers.append(RepoCutover(repo_cloner, sync_targets))
+        delta_sync = DeltaSync(logger, migration_properties.sync_poll_interval, migration_properties.sync_workers)
+        cutover_runner = CutoverRunner(logger, delta_sync, migration_properties.repo_workers)
+        reports = cutover_runner.run(repo_cutovers)
+    if report_file_path:
+        with open(report_file_path, 'w') as report_file:
+            json.dump(reports, report_file, indent=2)
+    return all(report["ok"] for report in reports)
+
+
+def sync_repos(migration_properties: MigrationConfig, logger, ssl_verify: bool, once: bool = False):
+    """
+    Keeps BitBucket repos in sync with Gitlab repos: polls Gitlab refs and transfers only changed refs
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    :param once: make single poll
+    """
+    sync_targets = []
+    clients = ClientRegistry(migration_properties.main_params, logger, ssl_verify)
+    with GitlabConnection(migration_properties.gitlab_api_base_url,
+                          migration_properties.gitlab_token, logger, ssl_verify) as gl_connection:
+        for repo in migration_properties.repos:
+            for gl_project in gl_connection.get_projects_from_group(repo.gitlab_group_name, repo.gitlab_project_name):
+                repo_cloner = make_repo_cloner(repo, gl_project, logger, ssl_verify, clients=clients)
+                sync_targets.extend(get_sync_targets(repo_cloner, migration_properties.sync_mirrors_path, logger))
+    logger.info(f'=== Syncing {len(sync_targets)} repos every {migration_properties.sync_poll_interval}s ===')
+    delta_sync = DeltaSync(logger, migration_properties.sync_poll_interval, migration_properties.sync_workers)
+    try:
+        delta_sync.run(sync_targets, once)
+    except KeyboardInterrupt:
+        logger.info('=== Sync stopped ===')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Utility for repositories migration from Gitlab to Bitbucket')
+    parser.add_argument('config', nargs='?', default=None, help='migration config YAML file')
+    parser.add_argument('schema', nargs='?', default=None, help='JSON schema for migration config')
+    parser.add_argument('--mode', choices=['migrate', 'verify', 'sync', 'export', 'import', 'warm', 'cutover'],
+                        default='migrate',
+                        help='migrate repos, only compare refs of Gitlab and BitBucket repos, '
+                             'keep BitBucket repos in sync with Gitlab, export Gitlab projects to archives, '
+                             'import archives to BitBucket, migrate without freezing Gitlab repos (warm phase) '
+                             'or freeze Gitlab repos and transfer changes made since warm phase (cutover)')
+    parser.add_argument('--report', default=None, help='file for verification or cutover JSON report')
+    parser.add_argument('--once', action='store_true', help='make single sync poll and exit')
+    parser.add_argument('--plan', action='store_true',
+                        help='only log steps and clients which will be used for every repo, nothing is connected')
+    parser.add_argument('--profile', nargs='+', choices=PROFILE_MODES, default=None,
+                        help='profile migration steps: cProfile with thread CPU time ("cpu") or wall clock ("wall") '
+                             'timer, sampling profiler ("sample"), tracemalloc snapshots ("memory")')
+    parser.add_argument('--profile-steps', nargs='+', default=None, help='steps to profile (all if not set)')
+    parser.add_argument('--profile-repos', nargs='+', default=None,
+                        help='repos (group/project) to profile (all if not set)')
+    parser.add_argument('--profile-path', default='gmu_profiles', help='folder for profiling results')
+    args = parser.parse_args()
+    if args.profile and 'cpu' in args.profile and 'wall' in args.profile:
+        parser.error('--profile accepts either "cpu" or "wall"')
+    return args
+
+
+def run_mode(args: argparse.Namespace, logger, ssl_verify: bool):
+    """
+    Runs mode chosen in command line arguments
+    :param args: parsed command line arguments
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    """
+    migration_properties = MigrationConfig(args.config, args.schema, logger)
+    if args.plan:
+        log_migration_plan(migration_properties, logger)
+        return
+    ssh_multiplexer = None
+    if migration_properties.ssh_multiplexing:
+        ssh_multiplexer = SshMultiplexer(logger, migration_properties.ssh_max_sessions,
+                                         migration_properties.ssh_control_persist)
+        set_ssh_multiplexer(ssh_multiplexer)
+    try:
+        run_git_mode(args, migration_properties, logger, ssl_verify)
+    finally:
+        if ssh_multiplexer is not None:
+            set_ssh_multiplexer(None)
+            ssh_multiplexer.close()
+
+
+def run_git_mode(args: argparse.Namespace, migration_properties: MigrationConfig, logger, ssl_verify: bool):
+    """
+    Runs mode chosen in command line arguments with loaded config
+    :param args: parsed command line arguments
+    :param migration_properties: migration config
+    :param logger: logger object
+    :param ssl_verify: if SSL cert will be verified
+    """
+    if args.mode == 'verify':
+        if not verify_repos(migration_properties, logger, ssl_verify, args.report):
+            exit(1)
+        return
+    if args.mode == 'sync':
+        sync_repos(migration_properties, logger, ssl_verify, args.once)
+        return
+    if args.mode == 'export':
+        if not export_repos(migration_properties, logger, ssl_verify):
+            exit(1)
+        return
+    jenkins_backup_store = None
+    if migration_properties.jenkins_backup_path:
+        jenkins_backup_store = JenkinsBackupStore(migration_properties.jenkins_backup_path, logger)
+    profiler = None
+    if args.profile:
+        profiler = RunProfiler(logger, args.profile_path, args.profile, args.profile_steps, args.profile_repos)
+    try:
+        if args.mode == 'import':
+            import_repos(migration_properties, logger, ssl_verify, jenkins_backup_store, profiler)
+        elif args.mode == 'warm':
+            warm_repos(migration_properties, logger, ssl_verify, jenkins_backup_store, profiler)
+        elif args.mode == 'cutover':
+            if not cutover_repos(migration_properties, logger, ssl_verify, jenkins_backup_store, args.report):
+                exit(1)
+        else:
+            migrate_repos(migration_properties, logger, ssl_verify, jenkins_backup_store, profiler)
+    finally:
+        if jenkins_backup_store is not None:
+            jenkins_backup_store.close()
+        if profiler is not None:
+            profiler.close()
+
+
 def main():
+    args = parse_args()
     ssl_verify = True if os.getenv("GIT_MIGRATION_SSL_VERIFY", 1) == 1 else False
-    os.system("clear")
     with open('logging_conf.yaml', 'r') as f:
         logging_cfg = yaml.safe_load(f.read())
     logging.config.dictConfig(logging_cfg)
     # get env variables
     is_gitlab_migrate_works_in_docker = True if os.getenv("gitlab_migrate_docker") == 1 else False
     logger = get_logger_and_prepare_run_environment(is_gitlab_migrate_works_in_docker)
+    # log records are written by background thread, so parallel repos don't wait for log I/O
+    log_listener = start_queue_logging(logger, os.getenv("GIT_MIGRATION_REPO_LOGS_PATH"))
     if not ssl_verify:
-        disable_warnings()  # urllib3
-    config_yaml_file = None
-    config_json_schema_file = None
-    if len(argv) == 3:
-        config_yaml_file = argv[1]
-        config_json_schema_file = argv[2]
-    elif len(argv) == 2:
-        config_yaml_file = argv[1]
-    migration_properties = MigrationConfig(config_yaml_file, config_json_schema_file, logger)
-    with GitlabConnection(migration_properties.gitlab_api_base_url,
-                          migration_properties.gitlab_token, logger, ssl_verify) as gl_connection:
-        for repo in migration_properties.repos:
-            for gl_project in gl_connection.get_projects_from_group(repo.gitlab_group_name, repo.gitlab_project_name):
-                logger.info(f'=== Starting work with repo [{repo.gitlab_group_name}/{gl_project.path}] ===')
-                with RepositoryCloner(repo, gl_project, logger, ssl_verify) as repo_cloner:
-                    repo_cloner.delete_bitbucket_repo()
-                    repo_cloner.create_bitbucket_repo()
-                    repo_cloner.archive_gitlab_project()
-                    repo_cloner.clone_repo()
-                    repo_cloner.enable_mirroring()
-                    repo_cloner.copy_merge_requests_from_gl_to_bb()
-                    repo_cloner.change_jenkins_jobs()
-                    repo_cloner.enable_webhook_for_bb_repo()
-                    repo_cloner.clear_tmp()
-                logger.info(f'=== Finished work with repo [{repo.gitlab_group_name}/{gl_project.path}] ===')
+        from urllib3 import disable_warnings
+        disable_warnings()
+    try:
+        run_mode(args, logger, ssl_verify)
+    finally:
+        log_listener.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+
+
+class RepoMigrationState:
+    def __init__(self, state_file_path: str):
+        """
+        Persistent map of Gitlab MR history to what was already posted to BitBucket repo:
+        MR iid -> PR id, MR iid -> PR header comment id, Gitlab note id -> PR comment id
+        and time of the last complete MRs copying.
+        Stored as append-only JSONL journal, every record is flushed as soon as it's made,
+        so a run which failed halfway leaves the state of everything posted before the failure
+        :param state_file_path: journal file path
+        """
+        self.__state_file_path = state_file_path
+        self.__lock = threading.Lock()
+        self.__prs = {}
+        self.__headers = {}
+        self.__comments = {}
+        self.__mrs_synced_at = None
+        if os.path.exists(state_file_path):
+            with open(state_file_path, 'r', encoding='utf-8') as state_file:
+                for line in state_file:
+                    if line.strip():
+                        self.__apply(json.loads(line))
+
+    def __apply(self, record: dict):
+        if 'mr' in record:
+            self.__prs[record['mr']] = record['pr']
+        elif 'header' in record:
+            self.__headers[record['header']] = record['comment']
+        elif 'note' in record:
+            self.__comments[record['note']] = record['comment']
+        elif 'mrs_synced_at' in record:
+            self.__mrs_synced_at = record['mrs_synced_at']
+
+    def __append(self, record: dict):
+        with self.__lock:
+            os.makedirs(os.path.dirname(self.__state_file_path), exist_ok=True)
+            with open(self.__state_file_path, 'a', encoding='utf-8') as state_file:
+                state_file.write(json.dumps(record) + '\n')
+                state_file.flush()
+                os.fsync(state_file.fileno())
+            self.__apply(record)
+
+    def get_pr_id(self, mr_iid: int):
+        return self.__prs.get(mr_iid)
+
+    def set_pr_id(self, mr_iid: int, pr_id: int):
+        self.__append({'mr': mr_iid, 'pr': pr_id})
+
+    def get_header_comment_id(self, mr_iid: int):
+        return self.__headers.get(mr_iid)
+
+    def set_header_comment_id(self, mr_iid: int, comment_id: int):
+        self.__append({'header': mr_iid, 'comment': comment_id})
+
+    def get_comment_id(self, note_id: int):
+        return self.__comments.get(note_id)
+
+    def set_comment_id(self, note_id: int, comment_id: int):
+        self.__append({'note': note_id, 'comment': comment_id})
+
+    @property
+    def mrs_synced_at(self):
+        """
+        Time (ISO 8601) when the last complete MRs copying started, None if MRs weren't copied completely
+        """
+        return self.__mrs_synced_at
+
+    def set_mrs_synced_at(self, synced_at: str):
+        self.__append({'mrs_synced_at': synced_at})
+
+    def reset(self):
+        """
+        Forgets everything, f.e. when BitBucket repo is deleted
+        """
+        with self.__lock:
+            if os.path.exists(self.__state_file_path):
+                os.remove(self.__state_file_path)
+            self.__prs.clear()
+            self.__headers.clear()
+            self.__comments.clear()
+            self.__mrs_synced_at = None
+
+
+def get_repo_state_file_path(state_path: str, bitbucket_project: str, bitbucket_repo_name: str) -> str:
+    """
+    Returns state journal path of BitBucket repo
+    :param state_path: folder for states
+    :param bitbucket_project: BitBucket project key
+    :param bitbucket_repo_name: BitBucket repo name
+    """
+    return f'{state_path}{bitbucket_project}/{bitbucket_repo_name}.jsonl'
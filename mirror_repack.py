@@ -0,0 +1,81 @@
+import os
+import time
+
+from git_commands import run_git
+
+CGROUP_V2_CPU_MAX_PATH = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_CPU_QUOTA_PATH = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_CPU_PERIOD_PATH = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+
+def _read_cgroup_cpu_limit():
+    """
+    Reads CPU limit of container (k8s pod limits are cgroup quotas, they aren't seen by os.cpu_count())
+    :return: number of CPUs or None if there is no limit
+    """
+    try:
+        if os.path.exists(CGROUP_V2_CPU_MAX_PATH):
+            with open(CGROUP_V2_CPU_MAX_PATH) as cpu_max_file:
+                quota, period = cpu_max_file.read().split()[:2]
+        else:
+            with open(CGROUP_V1_CPU_QUOTA_PATH) as quota_file, open(CGROUP_V1_CPU_PERIOD_PATH) as period_file:
+                quota, period = quota_file.read().strip(), period_file.read().strip()
+        if quota == 'max' or int(quota) <= 0:
+            return None
+        return max(1, int(quota) // int(period))
+    except (OSError, ValueError):
+        return None
+
+
+def get_available_cpus() -> int:
+    """
+    Returns number of CPUs the process may use: affinity mask limited by container CPU quota
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    cgroup_limit = _read_cgroup_cpu_limit()
+    return min(cpus, cgroup_limit) if cgroup_limit is not None else cpus
+
+
+def get_objects_size(repo_path: str) -> int:
+    """
+    Returns size of bare repo's object store in bytes
+    :param repo_path: bare repo path
+    """
+    objects_size = 0
+    for dir_path, _, file_names in os.walk(os.path.join(repo_path, 'objects')):
+        for file_name in file_names:
+            try:
+                objects_size += os.path.getsize(os.path.join(dir_path, file_name))
+            except OSError:
+                pass
+    return objects_size
+
+
+def repack_mirror(repo_path: str, threads: int, window: int, depth: int) -> dict:
+    """
+    Repacks bare mirror into single pack with reachability bitmaps before push,
+    so push reuses the pack instead of counting and compressing objects on the fly
+    :param repo_path: bare repo path
+    :param threads: pack.threads for delta search, CPUs available to the process if None
+    :param window: pack.window for delta search
+    :param depth: pack.depth for delta chains
+    :return: stats dict {"ok", "seconds", "threads", "size_before", "size_after", "output"}
+    """
+    if threads is None:
+        threads = get_available_cpus()
+    size_before = get_objects_size(repo_path)
+    start_time = time.monotonic()
+    cmd_output, cmd_result_code = run_git(['-c', f'pack.threads={threads}', '-c', f'pack.window={window}',
+                                           '-c', f'pack.depth={depth}', '-c', 'pack.writeBitmapHashCache=true',
+                                           'repack', '-a', '-d', '--write-bitmap-index'], repo_path)
+    return {
+        'ok': cmd_result_code == 0,
+        'seconds': round(time.monotonic() - start_time, 3),
+        'threads': threads,
+        'size_before': size_before,
+        'size_after': get_objects_size(repo_path),
+        'output': cmd_output
+    }
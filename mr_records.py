@@ -0,0 +1,79 @@
+MR_ATTRIBUTES = ('iid', 'title', 'description', 'source_branch', 'target_branch', 'created_at', 'author', 'labels')
+LABEL_ATTRIBUTES = ('name', 'color', 'description')
+
+
+def get_merge_request_attributes(gl_mr, page_size: int) -> dict:
+    """
+    Returns attributes of Gitlab MR needed to replay it, with its discussions (list of {"id", "notes"})
+    :param gl_mr: Gitlab MR (or its stand-in)
+    :param page_size: page size for discussions list
+    """
+    mr_attributes = {attribute: getattr(gl_mr, attribute, None) for attribute in MR_ATTRIBUTES}
+    mr_attributes['discussions'] = [
+        {'id': discussion.id, 'notes': discussion.attributes['notes']}
+        for discussion in gl_mr.discussions.list(order_by='created_at', sort='asc', iterator=True,
+                                                 per_page=page_size)
+    ]
+    return mr_attributes
+
+
+def get_label_attributes(gl_label) -> dict:
+    return {attribute: getattr(gl_label, attribute, None) for attribute in LABEL_ATTRIBUTES}
+
+
+class RecordList:
+    def __init__(self, items_factory, params: tuple = ()):
+        """
+        Stand-in for python-gitlab object manager, only ".list()" is supported
+        :param items_factory: callable returning iterable of records
+        :param params: names of list params passed to items_factory as keyword arguments (f.e. "updated_after")
+        """
+        self.__items_factory = items_factory
+        self.__params = params
+
+    def list(self, **kwargs):
+        """
+        Returns records, python-gitlab list params (order, pagination, etc.) other than supported ones are ignored:
+        records are stored in the order they have to be replayed
+        """
+        return self.__items_factory(**{name: kwargs[name] for name in self.__params if name in kwargs})
+
+
+class Record:
+    def __init__(self, attributes: dict):
+        """
+        Stand-in for python-gitlab object made from stored data, attributes are available through dot
+        :param attributes: object's attributes
+        """
+        self.attributes = attributes
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['attributes'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class MergeRequestRecord(Record):
+    def __init__(self, attributes: dict):
+        """
+        Stored Gitlab merge request, attributes include its discussions (list of {"id", "notes"})
+        """
+        super().__init__(attributes)
+        self.discussions = RecordList(lambda: (Record(discussion) for discussion in attributes.get('discussions', [])))
+
+
+class ProjectRecord(Record):
+    def __init__(self, attributes: dict, labels_factory, merge_requests_factory, merge_requests_params: tuple = ()):
+        """
+        Stored Gitlab project
+        :param attributes: project's attributes (path, web_url, default_branch, ...)
+        :param labels_factory: callable returning iterable of label attributes dicts
+        :param merge_requests_factory: callable returning iterable of merge request attributes dicts
+        :param merge_requests_params: names of MRs list params merge_requests_factory supports (f.e. "updated_after")
+        """
+        super().__init__(attributes)
+        self.labels = RecordList(lambda: [Record(label) for label in labels_factory()])
+        self.mergerequests = RecordList(lambda **params: (MergeRequestRecord(mr)
+                                                          for mr in merge_requests_factory(**params)),
+                                        merge_requests_params)
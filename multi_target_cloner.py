@@ -0,0 +1,230 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from datetime import datetime
+
+from bounded_pipeline import fan_out, prefetch
+from config_loader import RepoConfig
+from delta_sync import seed_sync_mirrors
+from jenkins_backup_store import JenkinsBackupStore
+from mr_records import ProjectRecord, get_label_attributes, get_merge_request_attributes
+from repository_cloner import RepositoryCloner
+from step_plugins import ClientRegistry
+
+
+class MultiTargetCloner:
+    def __init__(self, properties: RepoConfig, repo_cloners: list, logger):
+        """
+        Migrates one Gitlab repo to several BitBucket targets (f.e. prod and DR instances).
+        Gitlab side is read once: repo is cloned to one local mirror, MRs with discussions and labels are read once,
+        then mirror is pushed and MRs are replayed to every target concurrently.
+        Gitlab-only steps (archive, Jenkins jobs, local clone deletion) are made once by the first target's cloner.
+        Has the same steps methods as RepositoryCloner, every step result is {target name: result}
+        :param properties: repository migration parameters (of the main target)
+        :param repo_cloners: cloners of repo targets, the first one is the main target
+        """
+        self.__repo_properties = properties
+        self.__repo_cloners = repo_cloners
+        self.__logger = logger
+        self.__done_steps = {}
+
+    def __enter__(self):
+        return self
+
+    @property
+    def __main_cloner(self) -> RepositoryCloner:
+        return self.__repo_cloners[0]
+
+    @property
+    def repo_full_name(self):
+        return self.__main_cloner.repo_full_name
+
+    @property
+    def repository_size(self) -> int:
+        return self.__main_cloner.repository_size
+
+    @property
+    def gitlab_repo_url(self):
+        return self.__main_cloner.gitlab_repo_url
+
+    @property
+    def repack_stats(self) -> dict:
+        return self.__main_cloner.repack_stats
+
+    @property
+    def targets(self) -> list:
+        """
+        BitBucket targets: list of tuples (target config, target's cloner)
+        """
+        return [target for repo_cloner in self.__repo_cloners for target in repo_cloner.targets]
+
+    def set_merge_requests_source(self, merge_requests_source: ProjectRecord):
+        """
+        Sets Gitlab project stand-in which MRs and labels are read from once for all targets
+        :param merge_requests_source: Gitlab project stand-in with MRs (with discussions) and labels
+        """
+        self.__main_cloner.set_merge_requests_source(merge_requests_source)
+
+    def set_source_repo_url(self, source_repo_url: str):
+        """
+        Sets url (or path to git bundle) repo is cloned from for all targets
+        :param source_repo_url: source url, Gitlab repo url if None
+        """
+        for repo_cloner in self.__repo_cloners:
+            repo_cloner.set_source_repo_url(source_repo_url)
+
+    def set_done_steps(self, done_steps: dict):
+        """
+        Sets steps already made for some targets (f.e. by BitBucket provisioning), they aren't made for them again
+        :param done_steps: {target name: names of steps made for target}
+        """
+        self.__done_steps = done_steps
+
+    def __run_for_targets(self, step_name: str, make_step) -> dict:
+        """
+        Makes step for every target concurrently and logs result per target.
+        If step failed for some target, first exception is re-raised after step ends for all targets
+        :param step_name: step name
+        :param make_step: callable getting target's cloner and making step for it
+        :return: {target name: step result}
+        """
+        repo_cloners = [repo_cloner for repo_cloner in self.__repo_cloners
+                        if step_name not in self.__done_steps.get(repo_cloner.bitbucket_target_name, ())]
+        with ThreadPoolExecutor(max_workers=max(len(repo_cloners), 1)) as executor:
+            # target threads keep repo and step of log records
+            futures = {repo_cloner.bitbucket_target_name:
+                       executor.submit(contextvars.copy_context().run, make_step, repo_cloner)
+                       for repo_cloner in repo_cloners}
+        results = {}
+        error = None
+        for target_name, future in futures.items():
+            try:
+                results[target_name] = future.result()
+            except BaseException as err:
+                self.__logger.error(f'Step "{step_name}" failed for target [{target_name}]: {err!r}')
+                if error is None:
+                    error = err
+            else:
+                self.__logger.info(f'Step "{step_name}" is done for target [{target_name}]: {results[target_name]}')
+        if error is not None:
+            raise error
+        return results
+
+    def delete_bitbucket_repo(self) -> dict:
+        return self.__run_for_targets('delete_bitbucket_repo', RepositoryCloner.delete_bitbucket_repo)
+
+    def create_bitbucket_repo(self) -> dict:
+        return self.__run_for_targets('create_bitbucket_repo', RepositoryCloner.create_bitbucket_repo)
+
+    def archive_gitlab_project(self) -> bool:
+        return self.__main_cloner.archive_gitlab_project()
+
+    def clone_repo(self) -> dict:
+        """
+        Clones Gitlab repo once and pushes local mirror to all targets concurrently
+        :return: {target name: was repo pushed}
+        """
+        if not self.__repo_properties.will_gitlab_repo_be_cloned:
+            return {}
+        self.__logger.info(f'- Cloning for {len(self.__repo_cloners)} targets...')
+        local_path = self.__main_cloner.prepare_local_mirror()
+
+        def push_local_mirror(repo_cloner: RepositoryCloner) -> bool:
+            repo_cloner.push_local_mirror(local_path)
+            return True
+
+        return self.__run_for_targets('clone', push_local_mirror)
+
+    def seed_sync_mirrors(self) -> bool:
+        """
+        Makes persistent sync mirrors of all targets from the single local mirror
+        :return: were mirrors made
+        """
+        if not self.__repo_properties.will_gitlab_repo_be_cloned:
+            return False
+        self.__logger.info(f'- Making sync mirrors of {len(self.__repo_cloners)} targets from local mirror...')
+        return seed_sync_mirrors(self, self.__main_cloner.local_repo_path,
+                                 self.__repo_properties.main_params["sync_mirrors_path"], self.__logger) > 0
+
+    def verify_refs(self) -> dict:
+        return self.__run_for_targets('verify', RepositoryCloner.verify_refs)
+
+    def enable_mirroring(self) -> dict:
+        return self.__run_for_targets('mirror', RepositoryCloner.enable_mirroring)
+
+    def copy_merge_requests_from_gl_to_bb(self) -> dict:
+        """
+        Reads MRs with discussions and labels from Gitlab once and replays them to all targets concurrently.
+        MRs are streamed to targets, the slowest target holds reading back when it's a page of MRs behind
+        :return: {target name: were MRs copied}
+        """
+        if not self.__repo_properties.will_mrs_will_be_cloned:
+            return {}
+        page_size = self.__repo_properties.main_params["api_page_size"]
+        merge_requests_source = self.__main_cloner.merge_requests_source
+        # MRs updated since the oldest complete copying of all targets, all MRs if any target wasn't copied yet
+        targets_list_params = [repo_cloner.merge_requests_list_params for repo_cloner in self.__repo_cloners]
+        mrs_list_params = {}
+        if all(targets_list_params):
+            mrs_list_params['updated_after'] = min((list_params['updated_after']
+                                                    for list_params in targets_list_params),
+                                                   key=datetime.fromisoformat)
+            self.__logger.info(f'Only MRs updated after {mrs_list_params["updated_after"]} are read')
+        labels = [get_label_attributes(gl_label) for gl_label in merge_requests_source.labels.list(all=True)]
+        merge_requests = (get_merge_request_attributes(gl_mr, page_size) for gl_mr in
+                          prefetch(merge_requests_source.mergerequests.list(state='opened', order_by='created_at',
+                                                                            sort='asc', iterator=True,
+                                                                            per_page=page_size, **mrs_list_params),
+                                   page_size))
+        consumers = dict(zip(self.__repo_cloners, fan_out(merge_requests, len(self.__repo_cloners), page_size)))
+
+        def copy_merge_requests(repo_cloner: RepositoryCloner) -> bool:
+            consumer = consumers[repo_cloner]
+            repo_cloner.set_merge_requests_source(ProjectRecord({}, lambda: labels, lambda: consumer))
+            try:
+                return repo_cloner.copy_merge_requests_from_gl_to_bb()
+            finally:
+                # target which failed before reading all MRs doesn't hold the rest back
+                consumer.close()
+
+        try:
+            return self.__run_for_targets('merge_requests', copy_merge_requests)
+        finally:
+            # consumers of skipped targets
+            for consumer in consumers.values():
+                consumer.close()
+
+    def change_jenkins_jobs(self) -> bool:
+        # Jenkins jobs can point to one repo only, the main target
+        return self.__main_cloner.change_jenkins_jobs()
+
+    def enable_webhook_for_bb_repo(self) -> dict:
+        return self.__run_for_targets('webhook', RepositoryCloner.enable_webhook_for_bb_repo)
+
+    def clear_tmp(self) -> bool:
+        return self.__main_cloner.clear_tmp()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def make_repo_cloner(repo: RepoConfig, gl_project, logger, ssl_verify: bool = True,
+                     jenkins_backup_store: JenkinsBackupStore = None, clients: ClientRegistry = None,
+                     source_repo_url: str = None):
+    """
+    Makes cloner for all BitBucket targets of repo
+    :param repo: repo config
+    :param gl_project: Gitlab project (or its stand-in)
+    :param ssl_verify: if SSL cert will be verified
+    :param jenkins_backup_store: run's store for Jenkins jobs configs backups
+    :param clients: run's shared clients, targets in other BitBucket instances get their own clients
+    :param source_repo_url: url (or path to git bundle) to clone repo from instead of Gitlab repo url
+    :return: RepositoryCloner for single target, MultiTargetCloner for several targets
+    """
+    repo_cloners = []
+    for target in repo.targets:
+        target_clients = None if clients is None else clients.for_bitbucket(target.main_params)
+        repo_cloners.append(RepositoryCloner(target, gl_project, logger, ssl_verify, jenkins_backup_store,
+                                             target_clients, source_repo_url))
+    if len(repo_cloners) == 1:
+        return repo_cloners[0]
+    return MultiTargetCloner(repo, repo_cloners, logger)
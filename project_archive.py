@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+import gzip
+import io
+import json
+import os
+import shutil
+import tarfile
+
+from git_commands import run_git
+from mr_records import ProjectRecord, get_label_attributes, get_merge_request_attributes
+
+ARCHIVE_FORMAT_VERSION = 1
+ARCHIVE_SUFFIX = '.gmu.tar'
+MANIFEST_MEMBER = 'manifest.json'
+BUNDLE_MEMBER = 'repo.bundle'
+LABELS_MEMBER = 'labels.jsonl.gz'
+MERGE_REQUESTS_MEMBER = 'merge_requests.jsonl.gz'
+
+
+def get_archive_path(export_path: str, group_name: str, project_path: str) -> str:
+    return f'{export_path}{group_name}/{project_path}{ARCHIVE_SUFFIX}'
+
+
+def find_archives(export_path: str, group_name: str, project_path: str = None) -> list:
+    """
+    Finds project archives of Gitlab group (or single project)
+    :param export_path: folder with archives
+    :param group_name: Gitlab group
+    :param project_path: Gitlab project, all group's projects if None
+    :return: list of archives paths
+    """
+    if project_path is not None:
+        archive_path = get_archive_path(export_path, group_name, project_path)
+        return [archive_path] if os.path.exists(archive_path) else []
+    group_path = f'{export_path}{group_name}'
+    if not os.path.isdir(group_path):
+        return []
+    return sorted(os.path.join(group_path, file_name) for file_name in os.listdir(group_path)
+                  if file_name.endswith(ARCHIVE_SUFFIX))
+
+
+class ProjectExporter:
+    def __init__(self, logger, export_path: str, tmp_folder: str, api_page_size: int):
+        """
+        Exports Gitlab project to self-contained archive:
+        git bundle with branches and tags, labels and open MRs with discussions as compressed JSONL
+        :param export_path: folder for archives
+        :param tmp_folder: folder for temporary files
+        :param api_page_size: page size for MRs and discussions lists
+        """
+        self.__logger = logger
+        self.__export_path = export_path
+        self.__tmp_folder = tmp_folder
+        self.__api_page_size = api_page_size
+
+    def __write_jsonl(self, file_path: str, items):
+        with gzip.open(file_path, 'wt', encoding='utf-8') as jsonl_file:
+            for item in items:
+                jsonl_file.write(json.dumps(item, ensure_ascii=False))
+                jsonl_file.write('\n')
+
+    def __iter_merge_requests(self, gl_project):
+        for gl_mr in gl_project.mergerequests.list(state='opened', order_by='created_at', sort='asc',
+                                                   iterator=True, per_page=self.__api_page_size):
+            yield get_merge_request_attributes(gl_mr, self.__api_page_size)
+
+    def export(self, group_name: str, gl_project, gitlab_repo_url: str) -> str:
+        """
+        Exports single project
+        :param group_name: Gitlab group
+        :param gl_project: Gitlab project
+        :param gitlab_repo_url: Gitlab repo url to clone
+        :return: archive path, None if export failed (git or Gitlab API error)
+        """
+        repo_full_name = f'{group_name}/{gl_project.path}'
+        self.__logger.info(f'- Exporting [{repo_full_name}]...')
+        work_dir = f'{self.__tmp_folder}_export/{repo_full_name}'
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        try:
+            mirror_path = os.path.join(work_dir, 'repo.git')
+            is_repo_empty = False
+            cmd_output, cmd_result_code = run_git(['clone', '--mirror', gitlab_repo_url, mirror_path])
+            if cmd_result_code == 0:
+                cmd_output, cmd_result_code = run_git(['for-each-ref', '--count=1', 'refs/heads', 'refs/tags'],
+                                                      mirror_path)
+                # git can't make bundle without refs, empty repo is exported without bundle
+                is_repo_empty = cmd_result_code == 0 and not cmd_output
+            if cmd_result_code == 0 and not is_repo_empty:
+                cmd_output, cmd_result_code = run_git(['bundle', 'create', os.path.join(work_dir, BUNDLE_MEMBER),
+                                                       '--branches', '--tags'], mirror_path)
+            if cmd_result_code != 0:
+                self.__logger.error(f'Repo [{repo_full_name}] was not exported: {cmd_output}')
+                return None
+            self.__write_jsonl(os.path.join(work_dir, LABELS_MEMBER),
+                               (get_label_attributes(gl_label) for gl_label in gl_project.labels.list(all=True)))
+            self.__write_jsonl(os.path.join(work_dir, MERGE_REQUESTS_MEMBER), self.__iter_merge_requests(gl_project))
+            manifest = {
+                'format_version': ARCHIVE_FORMAT_VERSION,
+                'exported_at': datetime.now(timezone.utc).isoformat(),
+                'group': group_name,
+                'empty_repo': is_repo_empty,
+                'project': {
+                    'path': gl_project.path,
+                    'web_url': gl_project.web_url,
+                    'default_branch': gl_project.default_branch
+                }
+            }
+            with open(os.path.join(work_dir, MANIFEST_MEMBER), 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+            archive_path = get_archive_path(self.__export_path, group_name, gl_project.path)
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            # archive members are already compressed, so tar itself isn't
+            with tarfile.open(f'{archive_path}.tmp', 'w') as archive:
+                for member in (MANIFEST_MEMBER, BUNDLE_MEMBER, LABELS_MEMBER, MERGE_REQUESTS_MEMBER):
+                    if member != BUNDLE_MEMBER or not is_repo_empty:
+                        archive.add(os.path.join(work_dir, member), arcname=member)
+            os.replace(f'{archive_path}.tmp', archive_path)
+        except Exception as err:
+            # one failed project doesn't stop export of the rest
+            self.__logger.error(f'Repo [{repo_full_name}] was not exported: {err!r}')
+            return None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        self.__logger.info(f'- [{repo_full_name}] exported to {archive_path}')
+        return archive_path
+
+
+class ProjectArchive:
+    def __init__(self, archive_path: str):
+        """
+        Reads project archive made by ProjectExporter
+        :param archive_path: archive path
+        """
+        self.__archive_path = archive_path
+        with tarfile.open(archive_path, 'r') as archive:
+            self.__manifest = json.load(archive.extractfile(MANIFEST_MEMBER))
+            self.__bundle_size = 0 if self.is_repo_empty else archive.getmember(BUNDLE_MEMBER).size
+        if self.__manifest.get('format_version') != ARCHIVE_FORMAT_VERSION:
+            raise ValueError(f'Archive {archive_path} has unsupported format version')
+
+    @property
+    def group_name(self):
+        return self.__manifest['group']
+
+    @property
+    def is_repo_empty(self) -> bool:
+        """
+        Repo without branches and tags is exported without bundle
+        """
+        return self.__manifest.get('empty_repo', False)
+
+    def __iter_jsonl(self, member: str):
+        """
+        Reads archive's compressed JSONL member line by line
+        :param member: member name
+        :return: generator of dicts
+        """
+        with tarfile.open(self.__archive_path, 'r') as archive:
+            with gzip.GzipFile(fileobj=archive.extractfile(member)) as jsonl_file:
+                for line in io.TextIOWrapper(jsonl_file, encoding='utf-8'):
+                    yield json.loads(line)
+
+    def extract_bundle(self, bundle_path: str):
+        """
+        Extracts git bundle
+        :param bundle_path: path to write bundle to
+        """
+        os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+        with tarfile.open(self.__archive_path, 'r') as archive:
+            with open(bundle_path, 'wb') as bundle_file:
+                shutil.copyfileobj(archive.extractfile(BUNDLE_MEMBER), bundle_file)
+
+    def get_project(self) -> ProjectRecord:
+        """
+        Returns stand-in for Gitlab project, its labels and MRs are read from archive lazily
+        """
+        attributes = dict(self.__manifest['project'])
+        attributes['statistics'] = {'repository_size': self.__bundle_size}
+        return ProjectRecord(attributes, lambda: self.__iter_jsonl(LABELS_MEMBER),
+                             lambda: self.__iter_jsonl(MERGE_REQUESTS_MEMBER))
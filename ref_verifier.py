@@ -0,0 +1,70 @@
+from git_commands import run_git
+
+LS_REMOTE_TIMEOUT = 300
+
+
+def get_remote_refs(url: str, timeout: int = LS_REMOTE_TIMEOUT) -> dict:
+    """
+    Gets branches and tags of remote repo without transferring any objects
+    :param url: remote repo url
+    :param timeout: git ls-remote timeout in seconds
+    :return: dict {ref name: sha}
+    """
+    args = ['ls-remote', '--heads', '--tags', '--refs', url]
+    cmd_output, cmd_result_code = run_git(args, timeout=timeout)
+    if cmd_result_code != 0:
+        raise RuntimeError(f'Command "git {" ".join(args)}" exited with error {cmd_result_code}: {cmd_output}')
+    refs = {}
+    for line in cmd_output.splitlines():
+        sha, _, ref = line.partition('\t')
+        if ref:
+            refs[ref] = sha
+    return refs
+
+
+def diff_refs(source_refs: dict, target_refs: dict) -> dict:
+    """
+    Compares refs tables of source and target repos
+    :param source_refs: source repo refs {ref name: sha}
+    :param target_refs: target repo refs {ref name: sha}
+    :return: dict with refs missing in target, extra in target and divergent (different sha)
+    """
+    missing = {ref: sha for ref, sha in source_refs.items() if ref not in target_refs}
+    extra = {ref: sha for ref, sha in target_refs.items() if ref not in source_refs}
+    divergent = {ref: {"source": sha, "target": target_refs[ref]}
+                 for ref, sha in source_refs.items() if ref in target_refs and target_refs[ref] != sha}
+    return {"missing": missing, "extra": extra, "divergent": divergent}
+
+
+class RefVerifier:
+    def __init__(self, logger):
+        """
+        Verifies that target repos have the same branches and tags as source repos
+        """
+        self.__logger = logger
+
+    def verify(self, repo_name: str, source_url: str, target_url: str) -> dict:
+        """
+        Verifies single repo
+        :param repo_name: repo name for report
+        :param source_url: source (Gitlab) repo url
+        :param target_url: target (BitBucket) repo url
+        :return: report dict, "ok" is True if refs tables are equal
+        """
+        report = {"repo": repo_name, "source": source_url, "target": target_url}
+        try:
+            source_refs = get_remote_refs(source_url)
+            target_refs = get_remote_refs(target_url)
+        except Exception as err:
+            self.__logger.error(f'Refs of repo [{repo_name}] were not verified: {err}')
+            report.update({"ok": False, "error": str(err)})
+            return report
+        report.update(diff_refs(source_refs, target_refs))
+        report["refs"] = len(source_refs)
+        report["ok"] = not (report["missing"] or report["extra"] or report["divergent"])
+        if report["ok"]:
+            self.__logger.info(f'Refs of repo [{repo_name}] are equal ({len(source_refs)} refs)')
+        else:
+            self.__logger.warning(f'Refs of repo [{repo_name}] differ: {len(report["missing"])} missing, '
+                                  f'{len(report["extra"])} extra, {len(report["divergent"])} divergent')
+        return report
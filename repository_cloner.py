@@ -1,20 +1,35 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
 from sys import exit
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
 import json
 import os
 import subprocess
-import xml.etree.ElementTree as ElT
 
-from atlassian import Bitbucket
-from dateutil.parser import parse  # for datetime parsing
-from requests.auth import HTTPBasicAuth
-import jenkins
-import requests
-
-from gitlab.v4.objects import Project as GitlabProject
+from cloner_transforms import (format_comment_text, format_pr_header_comment,
+                               get_comment_to_codeline_creation_request_data, get_failed_branches,
+                               replace_markdown_links, rewrite_jenkins_job_config)
 from config_loader import RepoConfig
+from delta_sync import seed_sync_mirrors
+from git_commands import git_env
+from jenkins_backup_store import JenkinsBackupStore
+from log_pipeline import RateLimitedOutputLog
+from migration_state import RepoMigrationState, get_repo_state_file_path
+from mr_records import ProjectRecord
+from mirror_repack import repack_mirror
+from bounded_pipeline import prefetch
+from ref_verifier import RefVerifier
+from request_queue import RetryingRequestQueue
+from step_plugins import ClientRegistry
+
+if TYPE_CHECKING:
+    from gitlab.v4.objects import Project as GitlabProject
 
 JENKINS_JOB_NAME_PATTERN_ADDON = '_'
 JENKINS_FOLDER_NAME_PATTERN = 'backend'
+# MRs updated a bit earlier than the last complete copying are read again, so clocks skew doesn't lose notes
+MRS_UPDATED_AFTER_MARGIN = timedelta(minutes=10)
 
 
 class RepositoryCloner:
@@ -27,68 +42,204 @@ class RepositoryCloner:
         'X-Atlassian-Token': 'no-check'
     }
 
-    def __init__(self, properties: RepoConfig, gitlab_project: GitlabProject, logger, ssl_verify: bool = True):
+    def __init__(self, properties: RepoConfig, gitlab_project: 'GitlabProject', logger, ssl_verify: bool = True,
+                 jenkins_backup_store: JenkinsBackupStore = None, clients: ClientRegistry = None,
+                 source_repo_url: str = None):
         """
         Class making repository migration
         :param properties: repository migration parameters
-        :param gitlab_project: Gitlab Project Object
+        :param gitlab_project: Gitlab Project Object (or its stand-in made from stored data)
         :param ssl_verify: if SSL cert will be verified
+        :param jenkins_backup_store: run's store for Jenkins jobs configs backups
+        :param clients: run's shared BitBucket/Jenkins clients, opened at first use
+        :param source_repo_url: url (or path to git bundle) to clone repo from instead of Gitlab repo url
         """
         self.__logger = logger
+        self.__jenkins_backup_store = jenkins_backup_store
         self.__repo_properties = properties
         self.__gitlab_project = gitlab_project
         self.__ssl_verify = ssl_verify
-        try:
-            self.__bitbucket_connection = Bitbucket(url=self.__repo_properties.main_params["bitbucket_api_url"],
-                                                    username=self.__repo_properties.main_params["bitbucket_username"],
-                                                    password=self.__repo_properties.main_params["bitbucket_token"],
-                                                    verify_ssl=ssl_verify)
-        except Exception as err:
-            self.__logger.critical(f"Problem connecting to BitBucket: {err}")
-            exit(1)
-        jenkins_url = self.__repo_properties.main_params["jenkins_url"]
-        jenkins_username = self.__repo_properties.main_params["jenkins_username"]
-        jenkins_token = self.__repo_properties.main_params["jenkins_token"]
-        if jenkins_url and jenkins_username and jenkins_token:
-            try:
-                self.__jenkins_connection = jenkins.Jenkins(url=jenkins_url, username=jenkins_username,
-                                                            password=jenkins_token)
-                self.__jenkins_connection._session.verify = ssl_verify
-            except Exception as err:
-                self.__logger.error(f"Problem connecting to Jenkins: {err}")
-                if self.__repo_properties.will_jenkins_jobs_will_be_changed:
-                    exit(1)
+        if clients is None:
+            clients = ClientRegistry(properties.main_params, logger, ssl_verify)
+        self.__clients = clients
         self.__bitbucket_repo_urls = {}
         self.__bitbucket_repo = None
-        self.__bb_requests_auth = HTTPBasicAuth(
-            self.__repo_properties.main_params["bitbucket_username"],
-            self.__repo_properties.main_params["bitbucket_token"]
-        )
+        self.__gitlab_labels_cache = None
+        self.__source_repo_url = source_repo_url
+        self.__repack_stats = None
+        self.__migration_state_cache = None
+        self.__merge_requests_source_cache = None
 
     def __enter__(self):
         return self
 
+    @property
+    def __api_page_size(self):
+        return self.__repo_properties.main_params["api_page_size"]
+
+    @property
+    def __bitbucket_connection(self):
+        return self.__clients.bitbucket
+
+    @property
+    def __jenkins_connection(self):
+        return self.__clients.jenkins
+
+    @property
+    def __bb_requests_auth(self):
+        return self.__clients.bitbucket_auth
+
     @property
     def __bitbucket_repo_name(self):
         return f'{self.__repo_properties.bitbucket_repo_name_prefix}.{self.__gitlab_project.path}'
 
+    @property
+    def bitbucket_repo_name(self):
+        return self.__bitbucket_repo_name
+
+    @property
+    def bitbucket_target_name(self):
+        """
+        BitBucket repo name with its instance and project, f.e. "bitbucket.example.com/PRJ/prefix.repo"
+        """
+        bitbucket_host = urlparse(self.__repo_properties.main_params["bitbucket_api_url"]).netloc
+        return f'{bitbucket_host}/{self.__repo_properties.bitbucket_project}/{self.__bitbucket_repo_name}'
+
+    @property
+    def targets(self) -> list:
+        """
+        BitBucket targets of the cloner: list of tuples (target config, target's cloner), single target here
+        """
+        return [(self.__repo_properties, self)]
+
+    @property
+    def clients(self) -> ClientRegistry:
+        return self.__clients
+
     @property
     def _bitbucket_repo(self):
         if self.__bitbucket_repo is None:
             self.__bitbucket_repo = self.__get_bitbucket_repo()
         return self.__bitbucket_repo
 
+    @property
+    def repo_full_name(self):
+        return f'{self.__repo_properties.gitlab_group_name}/{self.__gitlab_project.path}'
+
+    @property
+    def merge_requests_source(self):
+        """
+        Gitlab project or its stand-in which MRs (with discussions) and labels are read from.
+        With "graphql" source they are read in bulk through Gitlab GraphQL API,
+        project read from archive already has them
+        """
+        if self.__merge_requests_source_cache is None:
+            self.__merge_requests_source_cache = self.__gitlab_project
+            if self.__repo_properties.main_params["merge_requests_source"] == 'graphql' and \
+                    not isinstance(self.__gitlab_project, ProjectRecord):
+                self.__merge_requests_source_cache = self.__clients.gitlab_graphql.get_project(
+                    self.__gitlab_project, self.repo_full_name)
+        return self.__merge_requests_source_cache
+
+    @property
+    def merge_requests_list_params(self) -> dict:
+        """
+        MRs list params: after complete copying only MRs updated since then are listed
+        :return: {"updated_after": ISO time} or empty dict if MRs weren't copied completely yet
+        """
+        if self.__migration_state.mrs_synced_at is None:
+            return {}
+        updated_after = datetime.fromisoformat(self.__migration_state.mrs_synced_at) - MRS_UPDATED_AFTER_MARGIN
+        return {'updated_after': updated_after.isoformat()}
+
+    def set_merge_requests_source(self, merge_requests_source: ProjectRecord):
+        """
+        Sets already read MRs and labels, so they aren't read from Gitlab again (f.e. for additional targets)
+        :param merge_requests_source: Gitlab project stand-in with MRs (with discussions) and labels
+        """
+        self.__merge_requests_source_cache = merge_requests_source
+        self.__gitlab_labels_cache = None
+
+    @property
+    def __migration_state(self) -> RepoMigrationState:
+        """
+        Persistent map of MRs, PRs and comments already posted to BitBucket repo
+        """
+        if self.__migration_state_cache is None:
+            self.__migration_state_cache = RepoMigrationState(get_repo_state_file_path(
+                self.__repo_properties.main_params["state_path"], self.__repo_properties.bitbucket_project,
+                self.__bitbucket_repo_name))
+        return self.__migration_state_cache
+
+    @property
+    def local_repo_path(self):
+        return self.__local_repo_path
+
+    @property
+    def __local_repo_path(self):
+        return f'{self.__repo_properties.main_params["tmp_folder"]}{self.repo_full_name}'
+
+    @property
+    def repository_size(self) -> int:
+        """
+        Gitlab repo size in bytes (from project statistics), 0 if statistics weren't got
+        """
+        statistics = getattr(self.__gitlab_project, 'statistics', None) or {}
+        return int(statistics.get('repository_size', 0))
+
+    @property
+    def gitlab_remote_url(self):
+        return f'{self.__repo_properties.main_params["gitlab_ssh_url"]}{self.repo_full_name}.git'
+
+    @property
+    def gitlab_repo_url(self):
+        if self.__source_repo_url is not None:
+            return self.__source_repo_url
+        return self.gitlab_remote_url
+
+    def set_source_repo_url(self, source_repo_url: str):
+        """
+        Sets url (or path to git bundle) repo is cloned from
+        :param source_repo_url: source url, Gitlab repo url if None
+        """
+        self.__source_repo_url = source_repo_url
+
+    def set_bitbucket_repo(self, bb_repo: dict):
+        """
+        Stores already got BitBucket repo info and its clone urls, so it isn't requested again
+        :param bb_repo: BitBucket repo info (as returned by BitBucket API)
+        """
+        for url in bb_repo['links']['clone']:
+            if url['name'] == 'http':
+                self.__bitbucket_repo_urls["http"] = url['href']
+            elif url['name'] == 'ssh':
+                self.__bitbucket_repo_urls["ssh"] = url['href']
+        self.__bitbucket_repo = bb_repo
+
+    def __fetch_bitbucket_repo(self):
+        """
+        Gets BitBucket repo info and stores its clone urls
+        :return: BitBucket repo info
+        """
+        bb_repo = self.__bitbucket_connection.get_repo(self.__repo_properties.bitbucket_project,
+                                                       self.__bitbucket_repo_name)
+        self.set_bitbucket_repo(bb_repo)
+        return bb_repo
+
+    def get_bitbucket_repo_url(self, url_type: str = 'ssh') -> str:
+        """
+        Returns BitBucket repo clone url, raises exception if repo info can't be got
+        :param url_type: url type (ssh or http)
+        :return: BitBucket repo url
+        """
+        if self.__bitbucket_repo is None:
+            self.__bitbucket_repo = self.__fetch_bitbucket_repo()
+        return self.__bitbucket_repo_urls.get(url_type)
+
     def __get_bitbucket_repo(self):
         """"""
         try:
-            bb_repo = self.__bitbucket_connection.get_repo(self.__repo_properties.bitbucket_project,
-                                                           self.__bitbucket_repo_name)
-            for url in bb_repo['links']['clone']:
-                if url['name'] == 'http':
-                    self.__bitbucket_repo_urls["http"] = url['href']
-                elif url['name'] == 'ssh':
-                    self.__bitbucket_repo_urls["ssh"] = url['href']
-            return bb_repo
+            return self.__fetch_bitbucket_repo()
         except Exception as err:
             self.__logger.critical(f'Connecting to BitBucket API problem: {err}, stopping!')
             exit(1)
@@ -106,8 +257,16 @@ class RepositoryCloner:
                                                     self.__bitbucket_repo_name)
         except Exception as err:
             self.__logger.warning(f"Error while deleting BitBucket repo: {err}")
+        # PRs and comments are deleted with repo, so they have to be posted again
+        self.reset_migration_state()
         return True
 
+    def reset_migration_state(self):
+        """
+        Forgets MRs, PRs and comments posted to BitBucket repo, f.e. when repo is deleted or made again
+        """
+        self.__migration_state.reset()
+
     def create_bitbucket_repo(self) -> bool:
         """
         Creates BitBucket repository and sets default branch
@@ -118,17 +277,17 @@ class RepositoryCloner:
         self.__logger.info('- Creating Bitbucket repo')
         bb_repo_name = self.__bitbucket_repo_name
         try:
-            self.__bitbucket_connection.create_repo(self.__repo_properties.bitbucket_project,
-                                                    bb_repo_name, forkable=True, is_private=True)
+            bb_repo = self.__bitbucket_connection.create_repo(self.__repo_properties.bitbucket_project,
+                                                              bb_repo_name, forkable=True, is_private=True)
         except Exception as err:
             self.__logger.warning(f'- Bitbucket Repo was not created - already exists? --- {err}')
-            try:
-                self.__bitbucket_connection.get_repo(self.__repo_properties.bitbucket_project, bb_repo_name)
-            except Exception as err:
-                self.__logger.critical(f'Connecting to BitBucket API problem: {err}, stopping!')
-                exit(1)
         else:
             self.__logger.info('- Bitbucket Repo created')
+            # new repo has no PRs, state left from repo deleted outside of the tool would skip all MRs
+            self.reset_migration_state()
+            # created repo info is returned by API, no need to request it again
+            if bb_repo and 'links' in bb_repo:
+                self.set_bitbucket_repo(bb_repo)
             try:
                 default_branch = self.__gitlab_project.default_branch
                 self.__bitbucket_connection.set_default_branch(self.__repo_properties.bitbucket_project,
@@ -173,13 +332,7 @@ class RepositoryCloner:
         :return: Was any branch failed to push to remote (True) or all branches ok (False)
         """
         self.__logger.debug(">>> Checking if all branches successfully pushed...")
-        # get list fof failed branch names
-        failed_branches = []
-        # some logic
-        for line in cmd_output.splitlines():
-            if '[rejected]' in line:
-                line_elements = [s.strip() for s in line.split()]
-                failed_branches.append(line_elements[line_elements.index('->') + 1])
+        failed_branches = get_failed_branches(cmd_output)
         # delete failed branches in BitBucket
         for branch in failed_branches:
             self.__logger.debug(self.__delete_bb_repo_branch(branch))
@@ -194,50 +347,40 @@ class RepositoryCloner:
         :return:
         """
         self.__logger.info(f'Executing "{cmd}" in directory "{workdir}"')
-        cmd_process = subprocess.Popen(cmd.split(), stdin=subprocess.PIPE, cwd=workdir,
-                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        # print the stdout/stderr as it comes in
-        cmd_result = ""
-        while True:
-            # The readline() will block until...
-            # it reads and returns a string that ends in a '\n',
-            # or until the process has ended which will result in '' string
-            cmd_result_line = cmd_process.stdout.readline().decode()
-            if cmd_result_line:
-                cmd_result += f'{cmd_result_line.strip()}\n'
-            elif cmd_process.poll() is not None:
-                break
-        cmd_result = cmd_result.strip()
-        # get the return code
-        cmd_result_code = cmd_process.wait()
+        # git commands go through shared SSH master connections
+        with git_env() if cmd.startswith('git ') else nullcontext() as env:
+            cmd_process = subprocess.Popen(cmd.split(), stdin=subprocess.PIPE, cwd=workdir, env=env,
+                                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            # log the stdout/stderr as it comes in, progress updates are rate-limited
+            output_log = RateLimitedOutputLog(self.__logger)
+            cmd_result = ""
+            output_line = None
+            while True:
+                # The readline() will block until...
+                # it reads and returns a string that ends in a '\n',
+                # or until the process has ended which will result in '' string
+                cmd_result_line = cmd_process.stdout.readline().decode()
+                if cmd_result_line:
+                    cmd_result += f'{cmd_result_line.strip()}\n'
+                    # git progress updates are separated by '\r'
+                    for output_line in filter(None, (line.strip() for line in cmd_result_line.split('\r'))):
+                        output_log.log(output_line)
+                elif cmd_process.poll() is not None:
+                    break
+            output_log.flush(output_line)
+            cmd_result = cmd_result.strip()
+            # get the return code
+            cmd_result_code = cmd_process.wait()
         return cmd_result, cmd_result_code
 
-    def clone_repo(self) -> bool:
+    def __clone_mirror(self, src_url: str, local_path: str):
         """
-        Clones repo from Gitlab to BitBucket
-        :return: Was repo cloned
+        Clones source repo as bare mirror
+        :param src_url: source repo url
+        :param local_path: local mirror path
         """
-        if not self.__repo_properties.will_gitlab_repo_be_cloned:
-            return False
-        # This check looks like doing nothing, but it fills self.__bitbucket_repo if it is None,
-        # just look into property realisation
-        # if self._bitbucket_repo is None:
-        #     pass
-        self.__logger.info('- Cloning...')
-        gl_group = self.__repo_properties.gitlab_group_name
-        gl_project = self.__gitlab_project.path
-        src_url = f'{self.__repo_properties.main_params["gitlab_ssh_url"]}{gl_group}/{gl_project}.git'
-        # src_url = self.__gitlab_project.ssh_url_to_repo
-        dst_url = self.__bitbucket_repo_urls.get('ssh')
-        if dst_url is None:
-            self.__logger.critical('No Bitbucket repo ssh url!')
-            # exit(1)
-        local_path = f'{self.__repo_properties.main_params["tmp_folder"]}{gl_group}/{gl_project}'
-        # clone gitlab repo to local path
-        cmd_result, _ = self.__exec_os_cmd(f'rm -rfv {local_path}')
-        self.__logger.debug(cmd_result)
-        cmd_result, _ = self.__exec_os_cmd(f'mkdir -p {local_path}')
-        self.__logger.debug(cmd_result)
+        self.__exec_os_cmd(f'rm -rfv {local_path}')
+        self.__exec_os_cmd(f'mkdir -p {local_path}')
         cmd = f'git --no-pager clone --progress --mirror {src_url} {local_path}'
         try:
             cmd_result, cmd_result_code = self.__exec_os_cmd(cmd)
@@ -248,22 +391,123 @@ class RepositoryCloner:
         except Exception as err:
             self.__logger.critical(err)
             exit(1)
-        self.__logger.debug(cmd_result)
-        cmd_result, _ = self.__exec_os_cmd(f'git remote rm origin', local_path)
-        self.__logger.debug(cmd_result)
-        # push local repo to bitbucket
-        self.__logger.info('Adding new remote...')
-        cmd_result, _ = self.__exec_os_cmd(f'git remote add origin {dst_url}', local_path)
-        self.__logger.debug(cmd_result)
-        self.__logger.info('Pushing branches...')
+
+    def __repack_mirror(self, local_path: str):
+        """
+        Repacks local mirror with reachability bitmaps, so push mostly reuses existing pack.
+        Repack failure isn't fatal: mirror stays valid and is pushed as is
+        :param local_path: local mirror path
+        """
+        main_params = self.__repo_properties.main_params
+        self.__logger.info('Repacking...')
+        self.__repack_stats = repack_mirror(local_path, main_params["repack_threads"],
+                                            main_params["repack_window"], main_params["repack_depth"])
+        self.__logger.debug(self.__repack_stats['output'])
+        if not self.__repack_stats['ok']:
+            self.__logger.error(f'Repo [{self.repo_full_name}] was not repacked: {self.__repack_stats["output"]}')
+            return
+        self.__logger.info(f'Repo [{self.repo_full_name}] repacked in {self.__repack_stats["seconds"]} s '
+                           f'with {self.__repack_stats["threads"]} threads, '
+                           f'objects size {self.__repack_stats["size_before"]} -> '
+                           f'{self.__repack_stats["size_after"]} bytes')
+
+    def __push_mirror(self, dst_url: str, local_path: str):
+        """
+        Pushes branches and tags of local mirror to BitBucket repo.
+        Repo url is passed to push directly, mirror's remotes aren't changed, so one mirror can be pushed
+        to several BitBucket repos at the same time
+        :param dst_url: BitBucket repo url
+        :param local_path: local mirror path
+        """
+        self.__logger.info(f'Pushing branches to {dst_url}...')
         is_some_branch_failed = True
         while is_some_branch_failed:
-            cmd_result, cmd_result_code = self.__exec_os_cmd(f'git push origin --all', local_path)
-            self.__logger.debug(cmd_result)
+            cmd_result, cmd_result_code = self.__exec_os_cmd(f'git push {dst_url} --all', local_path)
             is_some_branch_failed = self.__check_git_push_output_for_failed_branches(cmd_result)
-        self.__logger.info('Pushing tags...')
-        cmd_result = self.__exec_os_cmd(f'git push --tags', local_path)
-        self.__logger.debug(cmd_result)
+        self.__logger.info(f'Pushing tags to {dst_url}...')
+        self.__exec_os_cmd(f'git push {dst_url} --tags', local_path)
+
+    @property
+    def repack_stats(self) -> dict:
+        """
+        Stats of pre-push repack: {"ok", "seconds", "size_before", "size_after", "output"}, None if repo wasn't repacked
+        """
+        return self.__repack_stats
+
+    def prepare_local_mirror(self) -> str:
+        """
+        Clones Gitlab repo as local mirror and repacks it (if enabled)
+        :return: local mirror path
+        """
+        # src_url = self.__gitlab_project.ssh_url_to_repo
+        local_path = self.__local_repo_path
+        self.__clone_mirror(self.gitlab_repo_url, local_path)
+        if self.__repo_properties.will_repo_be_repacked:
+            self.__repack_mirror(local_path)
+        return local_path
+
+    def push_local_mirror(self, local_path: str):
+        """
+        Pushes local mirror to BitBucket repo
+        :param local_path: local mirror path
+        """
+        dst_url = self.__bitbucket_repo_urls.get('ssh')
+        if dst_url is None:
+            self.__logger.critical('No Bitbucket repo ssh url!')
+            # exit(1)
+        self.__push_mirror(dst_url, local_path)
+
+    def clone_repo(self) -> bool:
+        """
+        Clones repo from Gitlab to BitBucket: clones mirror, repacks it (if enabled) and pushes it
+        :return: Was repo cloned
+        """
+        if not self.__repo_properties.will_gitlab_repo_be_cloned:
+            return False
+        self.__logger.info('- Cloning...')
+        self.push_local_mirror(self.prepare_local_mirror())
+        return True
+
+    def seed_sync_mirrors(self) -> bool:
+        """
+        Makes persistent sync mirror from local mirror before it's deleted (warm phase of two-phase migration)
+        :return: were mirrors made
+        """
+        if not self.__repo_properties.will_gitlab_repo_be_cloned:
+            return False
+        self.__logger.info('- Making sync mirror from local mirror...')
+        return seed_sync_mirrors(self, self.__local_repo_path, self.__repo_properties.main_params["sync_mirrors_path"],
+                                 self.__logger) > 0
+
+    def get_refs_report(self) -> dict:
+        """
+        Compares branches and tags of Gitlab and BitBucket repos (git ls-remote, no objects transfer)
+        :return: report dict with missing, extra and divergent refs
+        """
+        try:
+            bitbucket_repo_url = self.get_bitbucket_repo_url()
+        except Exception as err:
+            self.__logger.error(f'Refs of repo [{self.repo_full_name}] were not verified: {err}')
+            return {"repo": self.repo_full_name, "source": self.gitlab_repo_url, "target": None,
+                    "ok": False, "error": str(err)}
+        return RefVerifier(self.__logger).verify(self.repo_full_name, self.gitlab_repo_url, bitbucket_repo_url)
+
+    def verify_refs(self) -> bool:
+        """
+        Verifies that BitBucket repo has the same branches and tags as Gitlab repo,
+        raises exception if refs differ or weren't compared, so the step fails
+        :return: was verification made
+        """
+        if not self.__repo_properties.will_refs_be_verified:
+            return False
+        self.__logger.info('- Verifying refs...')
+        report = self.get_refs_report()
+        if not report["ok"]:
+            if "error" in report:
+                raise RuntimeError(f'Refs of repo [{self.repo_full_name}] were not verified: {report["error"]}')
+            raise RuntimeError(f'Refs of BitBucket repo [{self.bitbucket_target_name}] differ from Gitlab repo: '
+                               f'{len(report["missing"])} missing, {len(report["extra"])} extra, '
+                               f'{len(report["divergent"])} divergent')
         return True
 
     def enable_mirroring(self) -> bool:
@@ -311,6 +555,7 @@ class RepositoryCloner:
         bb_project = self.__repo_properties.bitbucket_project
         bb_repo_name = self.__bitbucket_repo_name
         webhook_api_url = f'{bb_url}rest/api/latest/projects/{bb_project}/repos/{bb_repo_name}/webhooks'
+        import requests
         webhook_creation_data = json.dumps({
             "active": True,
             "events": ["pr:opened", "pr:from_ref_updated", "pr:modified"],
@@ -367,15 +612,7 @@ class RepositoryCloner:
         :param text: text in which links needs replacement
         :return: text with replaced links
         """
-        # We need to add full path to images, etc in descriptions, comments and so on.
-        # Because of Markdown in Gitlab. Check and insert full path
-        # Substring for replacing links to images, etc in PR descriptions
-        markdown_replace_string = f']({self.__gitlab_project.web_url}/uploads/'
-        # Replaces
-        text = text.replace('](/uploads/', markdown_replace_string)
-        text = text.replace('](uploads/', markdown_replace_string)
-        text = text.replace('] (/uploads/', markdown_replace_string)
-        return text.replace('] (uploads/', markdown_replace_string)
+        return replace_markdown_links(text, self.__gitlab_project.web_url)
 
     def __create_bitbucket_pull_request(self, gl_mr):
         """
@@ -387,6 +624,7 @@ class RepositoryCloner:
         # bb_pr_api_url = self.__repo_properties.main_params["bitbucket_api_url"]
         # bb_pr_api_url += self.__bitbucket_connection._url_pull_requests(self.__repo_properties.bitbucket_project,
         #                                                                 self.__bitbucket_repo_name)
+        import requests
         # PR description
         bb_pr_description = self.__replace_markdown_links(gl_mr.description)
         try:
@@ -406,14 +644,23 @@ class RepositoryCloner:
             self.__logger.error(f'Tried to create PR with parameters:\n{err.request.body}')
             self.__logger.error(f'Got a HTTP error with code {err.response.status_code} and text:\n{err.response.text}')
             return None
-        # creating comment in new PR with Gitlab's MR creation date and creator name
-        timestamp = parse(gl_mr.created_at).strftime("%d.%m.%Y, %H:%M:%S")
-        author = gl_mr.author['name']
-        comment_text = f'This pull request was created in Gitlab \non {timestamp} \nby {author}'
-        self.__bitbucket_connection.add_pull_request_comment(self.__repo_properties.bitbucket_project,
-                                                             self.__bitbucket_repo_name, new_pr['id'], comment_text)
+        self.__migration_state.set_pr_id(gl_mr.iid, new_pr['id'])
         return new_pr
 
+    def __add_pr_header_comment(self, gl_mr, bb_pr_id):
+        """
+        Creates comment in PR with Gitlab's MR creation date and creator name, if it wasn't created yet
+        :param gl_mr: Gitlab repo's Merge Request
+        :param bb_pr_id: BitBucket repo's PR id
+        """
+        if self.__migration_state.get_header_comment_id(gl_mr.iid) is not None:
+            return
+        comment_text = format_pr_header_comment(gl_mr.author['name'], gl_mr.created_at)
+        pr_comment = self.__bitbucket_connection.add_pull_request_comment(self.__repo_properties.bitbucket_project,
+                                                                          self.__bitbucket_repo_name, bb_pr_id,
+                                                                          comment_text)
+        self.__migration_state.set_header_comment_id(gl_mr.iid, pr_comment["id"])
+
     def __get_comment_to_codeline_creation_request_data(self, mr_comment_position: dict, comment_text: str) -> dict:
         """
         Returns data for request to create comment to code line in Bitbucket repo's pull request.
@@ -421,79 +668,49 @@ class RepositoryCloner:
         :param comment_text:
         :return: comment to codeline creation request data
         """
-        # Determining how and where to put comment
-        # does comment has string number in file's new version
-        is_newline = mr_comment_position['new_line'] is not None
-        # does comment has string number in file's old version
-        is_oldline = mr_comment_position['old_line'] is not None
-        line_number = 0  # comment's string number in file
-        linetype = ''  # comment's string type: deleted, added or not changed
-        filetype = ''  # comment's file type: "old" (before commit) or "new" (committed)
-        if not is_newline and not is_oldline:
+        if mr_comment_position['new_line'] is None and mr_comment_position['old_line'] is None:
             # comment has no new and no old string number - how is it possible?
             # this print is for debugging, never appeared
             self.__logger.warning('WTF with MR comments?')
-        elif not is_newline and is_oldline:
-            # has old line but not new - comment to deleted line
-            linetype = "REMOVED"
-            line_number = int(mr_comment_position['old_line'])
-            filetype = "FROM"
-        elif is_newline and not is_oldline:
-            # has new line but not old - comment to added line
-            linetype = "ADDED"
-            line_number = int(mr_comment_position['new_line'])
-            filetype = "TO"
-        elif is_newline and is_oldline:
-            # both lines present - comment to remained line
-            linetype = "CONTEXT"
-            line_number = int(mr_comment_position['old_line'])
-            filetype = "FROM"
-        # gathering body for request to BB API
-        comment_body = {
-            "text": comment_text,
-            "severity": "NORMAL",
-            "anchor": {
-                "diffType": "EFFECTIVE",
-                "path": mr_comment_position['new_path'],
-                "lineType": linetype,
-                "line": line_number,
-                "fileType": filetype
-            }
-        }
-        # if in GL MR comment old and new file names are not equal,
-        # then it is renaming, and we need to send toBB old path
-        if mr_comment_position['new_path'] != mr_comment_position['old_path']:
-            comment_body["anchor"]["srcPath"] = mr_comment_position['old_path']
-        return comment_body
+        return get_comment_to_codeline_creation_request_data(mr_comment_position, comment_text)
 
     def __copy_comments_from_mr_to_pr(self, gl_mr, bb_pr_id):
         """
-        Copies comments from GL repos' MR to BB repo's PR
+        Copies comments from GL repos' MR to BB repo's PR.
+        Notes which were already copied (by previous runs) are skipped, their PR comments are used as parents
         :param gl_mr: GL repo's MR
         :param bb_pr_id: BB repo's PR id
         :return:
         """
-        # get discussion list for Gitlab's MR
-        gl_mr_discussions = gl_mr.discussions.list(order_by='created_at', sort='asc', all=True)
+        migration_state = self.__migration_state
+        copied_count = 0
+        # get discussion list for Gitlab's MR, it's read lazily page by page
+        gl_mr_discussions = prefetch(gl_mr.discussions.list(order_by='created_at', sort='asc', iterator=True,
+                                                            per_page=self.__api_page_size), self.__api_page_size)
         # going through discussion list
         for gl_mr_discussion in gl_mr_discussions:
             # nulling parent comment ID in PR for new MR's discussion
             pr_root_comment_id = None
             # going though comments in MR's discussion
             for mr_comment in gl_mr_discussion.attributes['notes']:
-                # gathering comment's text
-                author = mr_comment['author']['name']
-                timestamp = parse(mr_comment['created_at']).strftime("%d.%m.%Y, %H:%M:%S")
-                # checking for images, etc in Markdown text
-                comment_text = self.__replace_markdown_links(mr_comment['body'])
-                comment_text = f"Created by {author} \nOn {timestamp} \n{comment_text}"
+                pr_comment_id = migration_state.get_comment_id(mr_comment['id'])
+                if pr_comment_id is not None:
+                    # already copied, it's still parent for the rest of discussion
+                    if pr_root_comment_id is None:
+                        pr_root_comment_id = pr_comment_id
+                    continue
+                # gathering comment's text, checking for images, etc in Markdown text
+                comment_text = format_comment_text(mr_comment['author']['name'], mr_comment['created_at'],
+                                                   self.__replace_markdown_links(mr_comment['body']))
+                copied_count += 1
                 # creating comment in PR
                 if pr_root_comment_id is not None:
                     # if comment has parent, then simply creating new comment disregarding it's type
-                    self.__bitbucket_connection.add_pull_request_comment(
+                    pr_comment = self.__bitbucket_connection.add_pull_request_comment(
                         self.__repo_properties.bitbucket_project, self.__bitbucket_repo_name,
                         bb_pr_id, comment_text, pr_root_comment_id
                     )
+                    migration_state.set_comment_id(mr_comment['id'], pr_comment["id"])
                     continue
                 # MR's comment with "DiffNote" type is comment to code
                 if mr_comment['type'] != 'DiffNote':
@@ -502,20 +719,31 @@ class RepositoryCloner:
                         self.__repo_properties.bitbucket_project, self.__bitbucket_repo_name,
                         bb_pr_id, comment_text, pr_root_comment_id
                     )
-                    # and save new comment's id as PR's comment parent id
-                    pr_root_comment_id = pr_comment["id"]
-                    continue
-                # If has no parent and it's comment to code, then:
-                # generating BB API URL
-                bb_api_url = self.__bitbucket_connection._url_pull_request_comments(
-                    self.__repo_properties.bitbucket_project, self.__bitbucket_repo_name, bb_pr_id
-                )
-                # generating request body
-                post_data = self.__get_comment_to_codeline_creation_request_data(mr_comment['position'], comment_text)
-                # sending request
-                pr_comment = self.__bitbucket_connection.post(bb_api_url, data=post_data)
+                else:
+                    # If has no parent and it's comment to code, then:
+                    # generating BB API URL
+                    bb_api_url = self.__bitbucket_connection._url_pull_request_comments(
+                        self.__repo_properties.bitbucket_project, self.__bitbucket_repo_name, bb_pr_id
+                    )
+                    # generating request body
+                    post_data = self.__get_comment_to_codeline_creation_request_data(mr_comment['position'],
+                                                                                     comment_text)
+                    # sending request
+                    pr_comment = self.__bitbucket_connection.post(bb_api_url, data=post_data)
+                migration_state.set_comment_id(mr_comment['id'], pr_comment["id"])
                 # and save new comment's id as PR's comment parent id
                 pr_root_comment_id = pr_comment["id"]
+        self.__logger.debug(f'{copied_count} comments of MR !{gl_mr.iid} copied to PR {bb_pr_id}')
+
+    @property
+    def __gitlab_labels(self) -> dict:
+        """
+        Gitlab project's labels by name, requested once
+        """
+        if self.__gitlab_labels_cache is None:
+            self.__gitlab_labels_cache = {gl_label.name: gl_label
+                                          for gl_label in self.merge_requests_source.labels.list(all=True)}
+        return self.__gitlab_labels_cache
 
     def __get_pr_label_creation_request_data(self, label_name) -> dict:
         """
@@ -523,61 +751,82 @@ class RepositoryCloner:
         :param label_name: label name
         :return: request body
         """
-        # getting list of existing in Gitlab's project labels
-        gl_labels = self.__gitlab_project.labels.list(all=True)
         # in MR's labels list label color isn't stored, so it has to be gathered from project's labels list
         label_color = '#FF0000'
-        for gl_label_with_info in gl_labels:
-            if label_name == gl_label_with_info.name:
-                label_color = gl_label_with_info.color
-                # BitBucket labels can't be emojis
-                # Gitlab labels can be emojis, so label name length will be 1 or 2 symbols
-                # If so, using label description as name.
-                # If description is empty, set name as "emoji
-                if len(gl_label_with_info.name) <= 2:
-                    label_name = gl_label_with_info.description if gl_label_with_info.description else 'emoji'
-                # Gitlab's label color can be 'strange'. And #FFFFFF looks bad in BB
-                if label_color.lower() == '#fff' or label_color.lower() == '#ffffff':
-                    label_color = '#f0f0f0'
-                break
+        gl_label_with_info = self.__gitlab_labels.get(label_name)
+        if gl_label_with_info is not None:
+            label_color = gl_label_with_info.color
+            # BitBucket labels can't be emojis
+            # Gitlab labels can be emojis, so label name length will be 1 or 2 symbols
+            # If so, using label description as name.
+            # If description is empty, set name as "emoji
+            if len(gl_label_with_info.name) <= 2:
+                label_name = gl_label_with_info.description if gl_label_with_info.description else 'emoji'
+            # Gitlab's label color can be 'strange'. And #FFFFFF looks bad in BB
+            if label_color.lower() == '#fff' or label_color.lower() == '#ffffff':
+                label_color = '#f0f0f0'
         return {'name': label_name, 'color': label_color}
 
-    def __copy_labels_from_mr_to_pr(self, gl_mr, bb_pr_id):
+    def __copy_labels_from_mrs_to_prs(self, mrs_labels: dict, new_bb_pr_ids: set) -> dict:
         """
-        Copies labels (name and color) from Gitlab repo's MR to BitBucket repo's PR
-        :param gl_mr: GL repo's MR
-        :param bb_pr_id: BB repo's PR id
-        :return:
+        Copies labels (name and color) from Gitlab repo's MRs to BitBucket repo's PRs.
+        PRs created by this run have no labels, so they aren't read. Labels plugin's REST API has labels per PR only
+        (no repo-wide list), so labels of PRs made by previous runs are read one request per PR
+        in one concurrent batch. Only missing labels are created through retrying requests queue
+        :param mrs_labels: dict {BB repo's PR id: GL repo's MR labels names}
+        :param new_bb_pr_ids: ids of PRs created by this run
+        :return: failures {PR id: list of errors}
         """
+        import requests
         # BitBucket API URL to Pull Request's labels
         bb_base_url = self.__repo_properties.main_params['bitbucket_api_url']
         bb_pr_labels_base_url = f"{bb_base_url}rest/io.reconquest.bitbucket.labels/1.0"
         bb_project_id = self._bitbucket_repo['project']['id']
         bb_repo_id = self._bitbucket_repo['id']
-        bb_pr_labels_url = f"{bb_pr_labels_base_url}/{bb_project_id}/{bb_repo_id}/pull-requests/{bb_pr_id}"
-        # getting existing PR's labels
-        pr_labels = requests.get(bb_pr_labels_url, auth=self.__bb_requests_auth, verify=self.__ssl_verify,
-                                 headers=self.__bb_rest_requests_headers).json()
-        pr_labels_names = [pr_label['name'] for pr_label in pr_labels['labels']]
-        # going through Gitlab MR's labels
-        for gl_label in gl_mr.labels:
-            # if label exists, skipping
-            if gl_label in pr_labels_names:
-                continue
-            # if label not found in PR, creating
-            bb_pr_new_label = requests.post(bb_pr_labels_url, data=self.__get_pr_label_creation_request_data(gl_label),
+        bb_pr_labels_urls = {bb_pr_id: f"{bb_pr_labels_base_url}/{bb_project_id}/{bb_repo_id}/pull-requests/{bb_pr_id}"
+                             for bb_pr_id, gl_labels in mrs_labels.items() if gl_labels}
+
+        existing_labels = {bb_pr_id: set() for bb_pr_id in bb_pr_labels_urls if bb_pr_id in new_bb_pr_ids}
+
+        def read_pr_labels_names(bb_pr_id):
+            pr_labels = requests.get(bb_pr_labels_urls[bb_pr_id], auth=self.__bb_requests_auth,
+                                     verify=self.__ssl_verify, headers=self.__bb_rest_requests_headers)
+            pr_labels.raise_for_status()
+            existing_labels[bb_pr_id] = {pr_label['name'] for pr_label in pr_labels.json()['labels']}
+
+        def create_pr_label(bb_pr_id, label_data: dict):
+            bb_pr_new_label = requests.post(bb_pr_labels_urls[bb_pr_id], data=label_data,
                                             auth=self.__bb_requests_auth, verify=self.__ssl_verify,
                                             headers=self.__bb_rest_requests_headers)
             if not 200 <= bb_pr_new_label.status_code < 300:
-                log_mgs = "Error creating label for Pull Request! "
-                log_mgs += f"BitBucket API response status code: {bb_pr_new_label.status_code}. "
-                log_mgs += f"Error: {bb_pr_new_label.text}"
-                self.__logger.critical(log_mgs)
-                exit(1)
+                raise RuntimeError(f"BitBucket API response status code: {bb_pr_new_label.status_code}. "
+                                   f"Error: {bb_pr_new_label.text}")
+
+        with RetryingRequestQueue(self.__logger) as labels_queue:
+            # getting labels of PRs made by previous runs
+            for bb_pr_id in bb_pr_labels_urls.keys() - existing_labels.keys():
+                labels_queue.put(bb_pr_id, f'Getting labels of Pull Request {bb_pr_id}',
+                                 lambda pr_id=bb_pr_id: read_pr_labels_names(pr_id))
+            labels_queue.join()
+            # creating missing labels, PRs whose labels weren't got are skipped
+            for bb_pr_id, pr_labels_names in existing_labels.items():
+                labels_data = {}
+                for gl_label in mrs_labels[bb_pr_id]:
+                    label_data = self.__get_pr_label_creation_request_data(gl_label)
+                    labels_data[label_data['name']] = label_data
+                for label_name in labels_data.keys() - pr_labels_names:
+                    labels_queue.put(bb_pr_id, f'Creating label "{label_name}" for Pull Request {bb_pr_id}',
+                                     lambda pr_id=bb_pr_id, label_data=labels_data[label_name]:
+                                     create_pr_label(pr_id, label_data))
+            failures = labels_queue.join()
+        for bb_pr_id, errors in failures.items():
+            self.__logger.error(f'Labels of Pull Request {bb_pr_id} were not copied completely: {"; ".join(errors)}')
+        return failures
 
     def copy_merge_requests_from_gl_to_bb(self) -> bool:
         """
-        Copies MRs from GL repo to BB repo
+        Copies MRs from GL repo to BB repo.
+        After complete copying only MRs updated since then (new MRs, MRs with new notes) are read from Gitlab
         :return: was MRs copied
         """
         if not self.__repo_properties.will_mrs_will_be_cloned:
@@ -591,57 +840,76 @@ class RepositoryCloner:
         # bb_pr_api_url = self.__repo_properties.main_params["bitbucket_api_url"]
         # bb_pr_api_url += self.__bitbucket_connection._url_pull_requests(self.__repo_properties.bitbucket_project,
         #                                                                 self.__bitbucket_repo_name)
-        # getting Gitlab repo MRs list
-        gl_mrs = self.__gitlab_project.mergerequests.list(state='opened', all=True, order_by='created_at', sort='asc')
-        # getting BitBucket repo PRs list
-        bb_prs = list(self.__bitbucket_connection.get_pull_requests(self.__repo_properties.bitbucket_project,
-                                                                    self.__bitbucket_repo_name,
-                                                                    state='OPEN', order='newest', limit=0, start=0))
+        # getting BitBucket repo PRs list page by page, only ids by titles and ids of all open PRs are kept
+        # (several open PRs can have the same title)
+        bb_prs = {}
+        open_bb_pr_ids = set()
+        for bb_pr in self.__bitbucket_connection.get_pull_requests(self.__repo_properties.bitbucket_project,
+                                                                   self.__bitbucket_repo_name, state='OPEN',
+                                                                   order='newest', limit=self.__api_page_size,
+                                                                   start=0):
+            bb_prs.setdefault(bb_pr['title'], {'id': bb_pr['id'], 'title': bb_pr['title']})
+            open_bb_pr_ids.add(bb_pr['id'])
+        mrs_list_params = self.merge_requests_list_params
+        if mrs_list_params:
+            self.__logger.info(f'Only MRs updated after {mrs_list_params["updated_after"]} are read')
+        mrs_listed_at = datetime.now(timezone.utc)
+        # getting Gitlab repo MRs list lazily page by page, so memory doesn't depend on project size
+        gl_mrs = prefetch(self.merge_requests_source.mergerequests.list(state='opened', order_by='created_at',
+                                                                          sort='asc', iterator=True,
+                                                                          per_page=self.__api_page_size,
+                                                                          **mrs_list_params),
+                          self.__api_page_size)
+        # PRs' labels are copied in one batch after all PRs are processed
+        mrs_labels = {}
+        new_bb_pr_ids = set()
+        is_complete = True
         # going through MRs list
         for gl_mr in gl_mrs:
-            # If PR already exists, storing it
-            for bb_pr in bb_prs.copy():
-                if bb_pr['title'] == gl_mr.title:
-                    new_bb_pr = bb_pr
-                    break
+            # PR made for MR by previous runs
+            bb_pr_id = self.__migration_state.get_pr_id(gl_mr.iid)
+            if bb_pr_id is None and gl_mr.title in bb_prs:
+                # PR was made before migration state was kept, its comments are unknown and aren't copied
+                bb_pr_id = bb_prs[gl_mr.title]['id']
+                self.__logger.warning(f'PR {bb_pr_id} for MR !{gl_mr.iid} was found by title, comments are not copied')
+                mrs_labels[bb_pr_id] = gl_mr.labels
+                continue
+            if bb_pr_id is not None and bb_pr_id not in open_bb_pr_ids:
+                self.__logger.warning(f'PR {bb_pr_id} for MR !{gl_mr.iid} is not open, skipping it')
+                continue
             # if PR not found, create it and store
-            else:
+            if bb_pr_id is None:
                 new_bb_pr = self.__create_bitbucket_pull_request(gl_mr)
                 if new_bb_pr is None:
+                    is_complete = False
                     continue
-                self.__copy_comments_from_mr_to_pr(gl_mr, new_bb_pr['id'])
-            # copying labels from MR to PR
-            self.__copy_labels_from_mr_to_pr(gl_mr, new_bb_pr['id'])
+                bb_pr_id = new_bb_pr['id']
+                new_bb_pr_ids.add(bb_pr_id)
+            # only comments missing in PR are posted
+            self.__add_pr_header_comment(gl_mr, bb_pr_id)
+            self.__copy_comments_from_mr_to_pr(gl_mr, bb_pr_id)
+            mrs_labels[bb_pr_id] = gl_mr.labels
+        # copying labels from MRs to PRs
+        if self.__copy_labels_from_mrs_to_prs(mrs_labels, new_bb_pr_ids):
+            is_complete = False
+        if is_complete:
+            self.__migration_state.set_mrs_synced_at(mrs_listed_at.isoformat())
         return True
 
-    def __backup_jenkins_job(self, job_config, job_folder: str, repo_name: str) -> bool:
+    def __backup_jenkins_job(self, job_config, job_fullname: str) -> bool:
         """
         Backs up Jenkins job's config
         :param job_config: Jenkins job config
-        :param job_folder: job folder name
-        :param repo_name: job name
+        :param job_fullname: job full name (with folders)
         :return: was job backed up
         """
         if not self.__repo_properties.will_jenkins_jobs_be_backed_up:
             return False
-        if len(self.__repo_properties.main_params['jenkins_backup_path']) == 0:
+        if self.__jenkins_backup_store is None:
             self.__logger.critical('Folder for Jenkins jobs backups not set!')
             exit(1)
         self.__logger.info('-- Backing up jobs')
-        # getting folder name with target job and getting path to backup folder
-        folder_name = job_folder.split('/')[0]
-        file_name = f"{repo_name}_config.xml"
-        backup_folder = f"{self.__repo_properties.main_params['jenkins_backup_path']}{folder_name}"
-        # creating backup folder
-        self.__exec_os_cmd(f'mkdir -p {backup_folder}')
-        backup_folder = os.popen(f'cd {backup_folder} && pwd').read()[:-1]
-        backup_fullpath = f"{backup_folder}/{file_name}"
-        # if file with target name exists, delete it
-        if os.path.exists(backup_fullpath):
-            os.remove(backup_fullpath)
-        # writing current config to file
-        with open(backup_fullpath, "w+") as text_file:
-            text_file.write(job_config)
+        self.__jenkins_backup_store.backup(job_fullname, job_config)
         return True
 
     def change_jenkins_jobs(self, bb_repo_url_type: str = 'ssh',
@@ -658,6 +926,10 @@ class RepositoryCloner:
         """
         if not self.__repo_properties.will_jenkins_jobs_will_be_changed:
             return False
+        # This check looks like doing nothing, but it fills self.__bitbucket_repo if it is None,
+        # just look into property realisation
+        if self._bitbucket_repo is None:
+            pass
         self.__logger.info(f'- Changing Jenkins jobs for repo {self.__gitlab_project.path}')
         jenkins_job_name_pattern = f'{self.__gitlab_project.path}{jenkins_job_name_pattern_addon}'
         for job in self.__jenkins_connection.get_jobs(folder_depth=1):
@@ -669,20 +941,8 @@ class RepositoryCloner:
             # making job copy, it's backup variant
             # self.__jenkins_connection.copy_job(job['fullname'], jobname_bkp)
             xml_job_config = self.__jenkins_connection.get_job_config(job['fullname'])
-            self.__backup_jenkins_job(xml_job_config, job['fullname'], job['name'])
-            # parsing XML config
-            xml_root = ElT.fromstring(xml_job_config)
-            # in string parameters looking for those which has in tag <name> value "PROJECT_GIT"
-            for parameter in xml_root.iter('hudson.model.StringParameterDefinition'):
-                if parameter.find('name').text == 'PROJECT_GIT':
-                    gl_repo_url = parameter.find('defaultValue').text  # storing old URL
-                    # creating param's description and putting both old and new URL there
-                    desc = f"{self.__bitbucket_repo_urls[bb_repo_url_type]} --- {gl_repo_url}"
-                    parameter.find('description').text = desc
-                    # changing default value
-                    parameter.find('defaultValue').text = self.__bitbucket_repo_urls[bb_repo_url_type]
-            # converting XML-object to sting
-            new_conf = ElT.tostring(xml_root, encoding='utf8').decode()
+            self.__backup_jenkins_job(xml_job_config, job['fullname'])
+            new_conf = rewrite_jenkins_job_config(xml_job_config, self.__bitbucket_repo_urls[bb_repo_url_type])
             # writing new config to job
             self.__logger.info(f'-- Reconfiguring job {job["fullname"]}')
             self.__jenkins_connection.reconfig_job(job['fullname'], new_conf)  # this method has no return
@@ -696,7 +956,9 @@ class RepositoryCloner:
         if not self.__repo_properties.will_local_tmp_be_deleted:
             return False
         self.__logger.info('- Cleaning local traces...')
-        self.__exec_os_cmd(f'rm -rf {self.__repo_properties.main_params["tmp_folder"]}')
+        # only this repo's folder is deleted, other repos can be migrated at the same time
+        self.__exec_os_cmd(f'rm -rf {self.__local_repo_path}')
+        return True
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+import time
+
+DEFAULT_QUEUE_WORKERS = 8
+DEFAULT_QUEUE_ATTEMPTS = 3
+DEFAULT_QUEUE_RETRY_DELAY = 1.0
+
+
+class RetryingRequestQueue:
+    def __init__(self, logger, workers: int = DEFAULT_QUEUE_WORKERS, attempts: int = DEFAULT_QUEUE_ATTEMPTS,
+                 retry_delay: float = DEFAULT_QUEUE_RETRY_DELAY):
+        """
+        Runs API write requests concurrently, retries failed ones and collects failures by key
+        instead of stopping the whole run
+        :param workers: number of requests run in parallel
+        :param attempts: attempts for every request
+        :param retry_delay: delay before first retry in seconds, doubled for every next retry
+        """
+        self.__logger = logger
+        self.__attempts = attempts
+        self.__retry_delay = retry_delay
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+        self.__futures = []
+        self.__failures = {}
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __run(self, key, description: str, request):
+        """
+        Runs request with retries
+        :param key: failures key (f.e. PR id)
+        :param description: request description for logs
+        :param request: callable making request, has to raise exception if request failed
+        """
+        delay = self.__retry_delay
+        for attempt in range(1, self.__attempts + 1):
+            try:
+                return request()
+            except Exception as err:
+                if attempt == self.__attempts:
+                    self.__logger.error(f'{description} failed after {attempt} attempts: {err}')
+                    with self.__lock:
+                        self.__failures.setdefault(key, []).append(f'{description}: {err}')
+                    return None
+                self.__logger.warning(f'{description} failed (attempt {attempt}): {err}, retrying...')
+                time.sleep(delay)
+                delay *= 2
+
+    def put(self, key, description: str, request):
+        """
+        Adds request to queue
+        :param key: failures key (f.e. PR id)
+        :param description: request description for logs
+        :param request: callable making request, has to raise exception if request failed
+        """
+        # request runs in caller's context, so its log records keep caller's repo and step
+        self.__futures.append(self.__executor.submit(contextvars.copy_context().run, self.__run, key, description,
+                                                     request))
+
+    def join(self) -> dict:
+        """
+        Waits for all requests
+        :return: failures {key: list of errors}
+        """
+        for future in self.__futures:
+            future.result()
+        self.__futures = []
+        return self.__failures
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.__executor.shutdown(wait=True)
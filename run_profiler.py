@@ -0,0 +1,157 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILE_MODES = ('cpu', 'wall', 'sample', 'memory')
+DEFAULT_SAMPLE_INTERVAL = 0.01
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP_STATS = 50
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float):
+        """
+        Low-overhead sampling profiler: background thread reads stack of profiled thread every interval,
+        so profiled code runs without tracing hooks. Samples include time spent waiting (HTTP, git subprocesses)
+        :param thread_id: id of sampled thread
+        :param interval: seconds between samples
+        """
+        self.__thread_id = thread_id
+        self.__interval = interval
+        self.__stacks = Counter()
+        self.__is_stopped = threading.Event()
+        self.__sampler = threading.Thread(target=self.__sample, daemon=True)
+
+    def __sample(self):
+        while not self.__is_stopped.wait(self.__interval):
+            frame = sys._current_frames().get(self.__thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f'{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:'
+                             f'{frame.f_code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.__stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.__sampler.start()
+
+    def stop(self):
+        self.__is_stopped.set()
+        self.__sampler.join()
+
+    def write_collapsed(self, file_path: str):
+        """
+        Writes samples in collapsed stacks format ("frame;frame;frame count" per line) for flame graph tools
+        :param file_path: output file path
+        """
+        with open(file_path, 'w') as collapsed_file:
+            for stack, count in self.__stacks.most_common():
+                collapsed_file.write(f'{stack} {count}\n')
+
+
+class RunProfiler:
+    def __init__(self, logger, profiles_path: str, modes: list, steps: list = None, repos: list = None,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """
+        Profiles selected migration steps of selected repos, results are written to run folder
+        <profiles_path>/<run start time>/<group>/<project>/<step>.<kind>
+        :param profiles_path: folder for profiling results
+        :param modes: profilers to use: "cpu" or "wall" (cProfile with thread CPU time or wall clock timer),
+                      "sample" (sampling profiler), "memory" (tracemalloc snapshots)
+        :param steps: step names to profile, all steps if empty
+        :param repos: repo full names (group/project) to profile, all repos if empty
+        :param sample_interval: seconds between samples of sampling profiler
+        """
+        if 'cpu' in modes and 'wall' in modes:
+            raise ValueError('cProfile can use either "cpu" or "wall" timer in one run')
+        self.__logger = logger
+        self.__modes = set(modes)
+        self.__steps = set(steps or [])
+        self.__repos = set(repos or [])
+        self.__sample_interval = sample_interval
+        self.__run_path = os.path.join(profiles_path, datetime.now().strftime('%Y%m%d-%H%M%S'))
+        # cProfile of python 3.12+ is process-wide, so only one step is profiled by it at a time
+        self.__cprofile_lock = threading.Lock()
+        self.__timings_lock = threading.Lock()
+        self.__is_tracemalloc_started = False
+        if 'memory' in self.__modes and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.__is_tracemalloc_started = True
+
+    @property
+    def run_path(self):
+        return self.__run_path
+
+    def is_profiled(self, repo_name: str, step_name: str) -> bool:
+        return (not self.__steps or step_name in self.__steps) and (not self.__repos or repo_name in self.__repos)
+
+    def __write_timing(self, repo_name: str, step_name: str, wall_seconds: float, cpu_seconds: float):
+        with self.__timings_lock:
+            with open(os.path.join(self.__run_path, 'timings.jsonl'), 'a') as timings_file:
+                timings_file.write(json.dumps({'repo': repo_name, 'step': step_name,
+                                               'wall_seconds': round(wall_seconds, 6),
+                                               'cpu_seconds': round(cpu_seconds, 6)}) + '\n')
+
+    @contextmanager
+    def profile(self, repo_name: str, step_name: str):
+        """
+        Profiles block run in current thread if repo and step are selected.
+        Wall and thread CPU time of every profiled block are written to timings.jsonl,
+        difference between them is time spent waiting (HTTP, git subprocesses, locks)
+        :param repo_name: repo full name
+        :param step_name: step name
+        """
+        if not self.is_profiled(repo_name, step_name):
+            yield
+            return
+        step_path = os.path.join(self.__run_path, repo_name, step_name)
+        os.makedirs(os.path.dirname(step_path), exist_ok=True)
+        profiler = None
+        if self.__modes & {'cpu', 'wall'}:
+            if self.__cprofile_lock.acquire(blocking=False):
+                profiler = cProfile.Profile(time.thread_time if 'cpu' in self.__modes else time.perf_counter)
+            else:
+                self.__logger.warning(f'Step "{step_name}" of [{repo_name}] is not profiled by cProfile: '
+                                      f'another step is being profiled')
+        sampler = None
+        if 'sample' in self.__modes:
+            sampler = StackSampler(threading.get_ident(), self.__sample_interval)
+            sampler.start()
+        memory_snapshot = tracemalloc.take_snapshot() if 'memory' in self.__modes else None
+        start_wall_time, start_cpu_time = time.perf_counter(), time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.__cprofile_lock.release()
+            wall_seconds = time.perf_counter() - start_wall_time
+            cpu_seconds = time.thread_time() - start_cpu_time
+            if profiler is not None:
+                profiler.dump_stats(f'{step_path}.{"cpu" if "cpu" in self.__modes else "wall"}.pstats')
+            if sampler is not None:
+                sampler.stop()
+                sampler.write_collapsed(f'{step_path}.collapsed')
+            if memory_snapshot is not None:
+                memory_stats = tracemalloc.take_snapshot().compare_to(memory_snapshot, 'lineno')
+                with open(f'{step_path}.tracemalloc.txt', 'w') as memory_file:
+                    for memory_stat in memory_stats[:TRACEMALLOC_TOP_STATS]:
+                        memory_file.write(f'{memory_stat}\n')
+            self.__write_timing(repo_name, step_name, wall_seconds, cpu_seconds)
+            self.__logger.info(f'Step "{step_name}" of [{repo_name}] profiled: wall {wall_seconds:.3f} s, '
+                               f'CPU {cpu_seconds:.3f} s')
+
+    def close(self):
+        if self.__is_tracemalloc_started:
+            tracemalloc.stop()
+        self.__logger.info(f'Profiling results are written to {self.__run_path}')
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+
+class SshMultiplexer:
+    def __init__(self, logger, max_sessions: int, control_persist: int):
+        """
+        Shared SSH master connections for git commands of the whole run: the first git command to a host opens
+        master connection, next ones run as its sessions without key exchange and auth.
+        Every master carries at most max_sessions git commands at a time (sshd's MaxSessions is 10 by default),
+        when all masters of the host are busy, git command opens one more master
+        :param max_sessions: max git commands at a time per master connection
+        :param control_persist: seconds idle master connection is kept open
+        """
+        self.__logger = logger
+        self.__max_sessions = max_sessions
+        self.__control_persist = control_persist
+        # unix socket path is limited to ~100 chars, so sockets are in short tmp path, not in sLocalRootPath
+        self.__control_dir = tempfile.mkdtemp(prefix='gmu-ssh-')
+        self.__base_ssh_command = os.environ.get('GIT_SSH_COMMAND', 'ssh')
+        self.__slots_sessions = []
+        self.__lock = threading.Lock()
+
+    def __get_ssh_command(self, slot: int) -> str:
+        # %C is hash of local host, remote host, port and user, so every git host has its own master per slot
+        return (f'{self.__base_ssh_command} -o ControlMaster=auto '
+                f'-o ControlPath={self.__control_dir}/%C-{slot} -o ControlPersist={self.__control_persist}')
+
+    @contextmanager
+    def git_env(self):
+        """
+        Takes master connection slot with free session while git command runs
+        :return: environment for git subprocess with GIT_SSH_COMMAND using that slot
+        """
+        with self.__lock:
+            for slot, sessions in enumerate(self.__slots_sessions):
+                if sessions < self.__max_sessions:
+                    break
+            else:
+                slot = len(self.__slots_sessions)
+                self.__slots_sessions.append(0)
+            self.__slots_sessions[slot] += 1
+        try:
+            yield {**os.environ, 'GIT_SSH_COMMAND': self.__get_ssh_command(slot)}
+        finally:
+            with self.__lock:
+                self.__slots_sessions[slot] -= 1
+
+    def close(self):
+        """
+        Closes master connections and removes their sockets
+        """
+        for socket_name in os.listdir(self.__control_dir):
+            # host isn't used by "-O exit" when control path is set explicitly
+            cmd_result = subprocess.run(['ssh', '-o', f'ControlPath={os.path.join(self.__control_dir, socket_name)}',
+                                         '-O', 'exit', 'gmu-ssh-master'], stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            self.__logger.debug(f'SSH master {socket_name} closed: {cmd_result.stdout.decode().strip()}')
+        shutil.rmtree(self.__control_dir, ignore_errors=True)
+        self.__logger.info(f'{len(self.__slots_sessions)} SSH master connection slots closed')
@@ -0,0 +1,91 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config_loader import DEFAULT_STEP_WORKERS
+from run_profiler import RunProfiler
+
+
+class StepGraphExecutor:
+    def __init__(self, logger, workers: int = DEFAULT_STEP_WORKERS, profiler: RunProfiler = None):
+        """
+        Runs repo's migration steps as dependency graph: every step starts as soon as all steps it requires are done,
+        independent steps of the same repo run concurrently
+        :param workers: max number of steps of the repo run at the same time
+        :param profiler: profiler of selected steps, steps aren't profiled if None
+        """
+        self.__logger = logger
+        self.__workers = workers
+        self.__profiler = profiler
+
+    def __run_step(self, plugin, repo_cloner):
+        if self.__profiler is None:
+            return plugin.run(repo_cloner)
+        with self.__profiler.profile(repo_cloner.repo_full_name, plugin.name):
+            return plugin.run(repo_cloner)
+
+    @staticmethod
+    def __check_graph(plugins: list, all_plugins: dict):
+        """
+        Checks that required steps are known and there are no cycles
+        :param plugins: steps to run
+        :param all_plugins: all registered steps {name: plugin}
+        """
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f'Migration steps dependency cycle at step "{name}"')
+            if name not in all_plugins:
+                raise ValueError(f'Unknown migration step "{name}"')
+            visiting.add(name)
+            for required_name in all_plugins[name].requires:
+                visit(required_name)
+            visiting.remove(name)
+            visited.add(name)
+
+        for plugin in plugins:
+            visit(plugin.name)
+
+    def run(self, plugins: list, all_plugins: dict, repo_cloner) -> dict:
+        """
+        Runs steps. Required steps which are not in the list (turned off for the repo) are considered done.
+        If a step fails, no new steps are started and exception is re-raised after running steps end
+        :param plugins: steps turned on for the repo
+        :param all_plugins: all registered steps {name: plugin}
+        :param repo_cloner: repo's RepositoryCloner
+        :return: steps results {step name: result}
+        """
+        self.__check_graph(plugins, all_plugins)
+        pending = {plugin.name: plugin for plugin in plugins}
+        results = {}
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            while pending or running:
+                if error is None:
+                    running_names = set(running.values())
+                    for name, plugin in list(pending.items()):
+                        # required step is ready if it's done or isn't run for this repo at all
+                        if all(required_name in results or (required_name not in pending and
+                                                            required_name not in running_names)
+                               for required_name in plugin.requires):
+                            self.__logger.debug(f'Starting step "{name}"')
+                            running[executor.submit(self.__run_step, plugin, repo_cloner)] = name
+                            running_names.add(name)
+                            del pending[name]
+                elif not running:
+                    break
+                if not running:
+                    raise RuntimeError(f'Migration steps {list(pending)} can not be started')
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except BaseException as err:
+                        if error is None:
+                            error = err
+        if error is not None:
+            raise error
+        return results
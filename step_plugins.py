@@ -0,0 +1,183 @@
+from sys import exit
+import threading
+
+from config_loader import RepoConfig
+from log_pipeline import log_context
+
+
+class ClientRegistry:
+    def __init__(self, main_params: dict, logger, ssl_verify: bool = True):
+        """
+        Clients of external services shared by all repos of the run.
+        Client library is imported and connection is opened at first use only,
+        so steps that are turned off in config cost nothing
+        :param main_params: main params from migration config
+        :param ssl_verify: if SSL cert will be verified
+        """
+        self.__main_params = main_params
+        self.__logger = logger
+        self.__ssl_verify = ssl_verify
+        self.__lock = threading.Lock()
+        self.__bitbucket = None
+        self.__bitbucket_auth = None
+        self.__jenkins = None
+        self.__gitlab_graphql = None
+        self.__bitbucket_registries = {}
+
+    @property
+    def ssl_verify(self):
+        return self.__ssl_verify
+
+    def for_bitbucket(self, main_params: dict) -> 'ClientRegistry':
+        """
+        Returns registry for BitBucket instance of repo target, one registry per instance is made
+        :param main_params: main params of repo target
+        :return: this registry if target is in the same BitBucket instance
+        """
+        bitbucket_url = main_params["bitbucket_api_url"]
+        if bitbucket_url == self.__main_params["bitbucket_api_url"]:
+            return self
+        with self.__lock:
+            if bitbucket_url not in self.__bitbucket_registries:
+                self.__bitbucket_registries[bitbucket_url] = ClientRegistry(main_params, self.__logger,
+                                                                            self.__ssl_verify)
+            return self.__bitbucket_registries[bitbucket_url]
+
+    @property
+    def bitbucket(self):
+        with self.__lock:
+            if self.__bitbucket is None:
+                from atlassian import Bitbucket
+                try:
+                    self.__bitbucket = Bitbucket(url=self.__main_params["bitbucket_api_url"],
+                                                 username=self.__main_params["bitbucket_username"],
+                                                 password=self.__main_params["bitbucket_token"],
+                                                 verify_ssl=self.__ssl_verify)
+                except Exception as err:
+                    self.__logger.critical(f"Problem connecting to BitBucket: {err}")
+                    exit(1)
+            return self.__bitbucket
+
+    @property
+    def bitbucket_auth(self):
+        with self.__lock:
+            if self.__bitbucket_auth is None:
+                from requests.auth import HTTPBasicAuth
+                self.__bitbucket_auth = HTTPBasicAuth(self.__main_params["bitbucket_username"],
+                                                      self.__main_params["bitbucket_token"])
+            return self.__bitbucket_auth
+
+    @property
+    def jenkins(self):
+        with self.__lock:
+            if self.__jenkins is None:
+                jenkins_url = self.__main_params["jenkins_url"]
+                jenkins_username = self.__main_params["jenkins_username"]
+                jenkins_token = self.__main_params["jenkins_token"]
+                if not (jenkins_url and jenkins_username and jenkins_token):
+                    self.__logger.critical('Jenkins url, user or token not set!')
+                    exit(1)
+                import jenkins
+                try:
+                    self.__jenkins = jenkins.Jenkins(url=jenkins_url, username=jenkins_username,
+                                                     password=jenkins_token)
+                    self.__jenkins._session.verify = self.__ssl_verify
+                except Exception as err:
+                    self.__logger.critical(f"Problem connecting to Jenkins: {err}")
+                    exit(1)
+            return self.__jenkins
+
+    @property
+    def gitlab_graphql(self):
+        with self.__lock:
+            if self.__gitlab_graphql is None:
+                from gitlab_graphql import GitlabGraphqlClient
+                self.__gitlab_graphql = GitlabGraphqlClient(self.__main_params["gitlab_api_url"],
+                                                            self.__main_params["gitlab_token"], self.__logger,
+                                                            self.__ssl_verify)
+            return self.__gitlab_graphql
+
+
+class StepPlugin:
+    def __init__(self, name: str, method_name: str, is_enabled, clients: tuple = (), requires: tuple = ()):
+        """
+        Migration step
+        :param name: step name
+        :param method_name: RepositoryCloner method making the step
+        :param is_enabled: callable getting RepoConfig and returning if step is turned on for repo
+        :param clients: names of ClientRegistry clients used by step
+        :param requires: names of steps which have to be done before this step (if turned on for repo)
+        """
+        self.name = name
+        self.method_name = method_name
+        self.is_enabled = is_enabled
+        self.clients = clients
+        self.requires = requires
+
+    def run(self, repo_cloner):
+        """
+        Runs step for repo
+        :param repo_cloner: repo's RepositoryCloner
+        :return: step result
+        """
+        with log_context(repo=repo_cloner.repo_full_name, step=self.name):
+            return getattr(repo_cloner, self.method_name)()
+
+
+# steps registry, every step is run as soon as steps it requires are done
+STEP_PLUGINS = {}
+# steps which need live Gitlab project, they can't be run for repos imported from archives
+GITLAB_ONLY_STEPS = frozenset({'archive', 'verify', 'mirror'})
+# steps made only by warm phase of two-phase migration
+WARM_ONLY_STEPS = frozenset({'seed_sync'})
+
+
+def register_step_plugin(plugin: StepPlugin) -> StepPlugin:
+    STEP_PLUGINS[plugin.name] = plugin
+    return plugin
+
+
+def get_enabled_step_plugins(repo: RepoConfig) -> list:
+    """
+    Returns steps turned on for repo
+    :param repo: repo config
+    :return: list of StepPlugin
+    """
+    return [plugin for plugin in STEP_PLUGINS.values() if plugin.is_enabled(repo)]
+
+
+register_step_plugin(StepPlugin('delete_bitbucket_repo', 'delete_bitbucket_repo',
+                                lambda repo: repo.will_bitbucket_repo_be_deleted_at_start_if_exists, ('bitbucket',)))
+register_step_plugin(StepPlugin('create_bitbucket_repo', 'create_bitbucket_repo',
+                                lambda repo: repo.will_gitlab_repo_be_cloned, ('bitbucket',),
+                                requires=('delete_bitbucket_repo',)))
+register_step_plugin(StepPlugin('archive', 'archive_gitlab_project',
+                                lambda repo: repo.will_gitlab_repo_become_readonly))
+# Gitlab repo is made readonly before cloning, so nothing is pushed to it while cloning
+register_step_plugin(StepPlugin('clone', 'clone_repo',
+                                lambda repo: repo.will_gitlab_repo_be_cloned, ('bitbucket',),
+                                requires=('create_bitbucket_repo', 'archive')))
+register_step_plugin(StepPlugin('verify', 'verify_refs',
+                                lambda repo: repo.will_refs_be_verified, ('bitbucket',),
+                                requires=('clone',)))
+register_step_plugin(StepPlugin('mirror', 'enable_mirroring',
+                                lambda repo: repo.will_mirroring_be_enabled_for_gitlab_repo, ('bitbucket',),
+                                requires=('create_bitbucket_repo', 'clone')))
+# PRs need only pushed branches
+register_step_plugin(StepPlugin('merge_requests', 'copy_merge_requests_from_gl_to_bb',
+                                lambda repo: repo.will_mrs_will_be_cloned, ('bitbucket',),
+                                requires=('create_bitbucket_repo', 'clone')))
+# Jenkins jobs and webhook need only BitBucket repo to exist
+register_step_plugin(StepPlugin('jenkins', 'change_jenkins_jobs',
+                                lambda repo: repo.will_jenkins_jobs_will_be_changed, ('bitbucket', 'jenkins'),
+                                requires=('create_bitbucket_repo',)))
+register_step_plugin(StepPlugin('webhook', 'enable_webhook_for_bb_repo',
+                                lambda repo: repo.will_webhook_be_enabled, ('bitbucket',),
+                                requires=('create_bitbucket_repo',)))
+# warm phase keeps local mirror as persistent sync mirror before it's deleted
+register_step_plugin(StepPlugin('seed_sync', 'seed_sync_mirrors',
+                                lambda repo: repo.will_gitlab_repo_be_cloned, ('bitbucket',),
+                                requires=('clone',)))
+register_step_plugin(StepPlugin('clear', 'clear_tmp',
+                                lambda repo: repo.will_local_tmp_be_deleted,
+                                requires=('clone', 'seed_sync')))